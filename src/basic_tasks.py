@@ -10,6 +10,7 @@
     Public License, Version 2. 
 """
 
+import array
 import gc
 import pyb
 import cotask
@@ -41,11 +42,15 @@ def task2_fun(shares):
     # Get references to the share and queue which have been passed to this task
     the_share, the_queue = shares
 
+    # A buffer into which the queue's contents are copied in one block
+    items = array.array('L', range(16))
+
     while True:
         # Show everything currently in the queue and the value in the share
         print(f"Share: {the_share.get ()}, Queue: ", end='')
-        while q0.any():
-            print(f"{the_queue.get ()} ", end='')
+        num_items = the_queue.get_into(items)
+        for idx in range(num_items):
+            print(f"{items[idx]} ", end='')
         print('')
 
         yield 0
@@ -63,10 +68,9 @@ if __name__ == "__main__":
     q0 = task_share.Queue('L', 16, thread_protect=False, overwrite=False,
                           name="Queue 0")
 
-    # Create the tasks. If trace is enabled for any task, memory will be
-    # allocated for state transition tracing, and the application will run out
-    # of memory after a while and quit. Therefore, use tracing only for 
-    # debugging and set trace to False when it's not needed
+    # Create the tasks. If trace is enabled for any task, a fixed amount of
+    # memory is allocated to hold the most recent state transitions. Tracing
+    # slows the tasks down a little, so set trace to False when it's not needed
     task1 = cotask.Task(task1_fun, name="Task_1", priority=1, period=400,
                         profile=True, trace=False, shares=(share0, q0))
     task2 = cotask.Task(task2_fun, name="Task_2", priority=2, period=1500,
@@ -78,15 +82,18 @@ if __name__ == "__main__":
     # possible before the real-time scheduler is started
     gc.collect()
 
-    # Run the scheduler with the chosen scheduling algorithm. Quit if ^C pressed
-    while True:
-        try:
-            cotask.task_list.pri_sched()
-        except KeyboardInterrupt:
-            break
+    # Run the scheduler with the chosen scheduling algorithm, waiting for the
+    # next interrupt whenever no task is ready. Quit if ^C pressed
+    try:
+        cotask.task_list.run_forever(cotask.task_list.pri_sched,
+                                     idle=lambda us: pyb.wfi())
+    except KeyboardInterrupt:
+        pass
 
     # Print a table of task data and a table of shared information data
     print('\n' + str (cotask.task_list))
+    print(cotask.task_list.hist_repr())
     print(task_share.show_all())
-    print(task1.get_trace())
+    for line in task1.iter_trace():
+        print(line)
     print('')
@@ -3,38 +3,107 @@
    class. This class is used to control a motor in the ME 405 lab.
 """
 import pyb
+import utime
+from array import array
+from micropython import const
+
+## The number of fraction bits in gains stored in fixed point
+Q_BITS = const(12)
+
+## The largest magnitude of the output in fixed point mode, which matches the
+#  range of @c MotorDriver.set_duty_cycle()
+OUT_LIMIT = const(99)
 
 class CLPController:
     """! 
     closed loop proportional controller class 
+
+    The most recent measured output is kept in @c latest_output. If the
+    controller is made with a nonzero @c log_size, the times and measured
+    outputs of the most recent runs are also kept in a ring buffer which is
+    allocated when the controller is created, so running the controller
+    never makes the heap grow.
+
+    In fixed point mode the gain is kept as an integer with @c Q_BITS
+    fraction bits and the output is an integer limited to +/- @c OUT_LIMIT.
+    Each run then uses only small integers, so on MicroPython it doesn't
+    allocate any memory, while a float result is a new object on the heap.
     """
-    def __init__ (self, Kp = 1, setpoint = 0):
+    def __init__ (self, Kp = 1, setpoint = 0, log_size = 0, fixed = False):
         """!
         Initialize the closed loop proportional controller with Kp and setpoint.
         @param Kp Proportional gain value (default value is 1)
         @param setpoint Setpoint for the controller (default value is 0)
+        @param log_size How many samples of time and measured output to keep
+               for @c print_response() (default value is 0, no log)
+        @param fixed @c True to compute the output in fixed point (default
+               value is @c False)
         """
-        self.Kp = Kp
         self.setpoint = setpoint
+        self._fixed = fixed
+        self.set_Kp(Kp)
         
-        self.times = list()
-        self.motor_positions = list()
+        ## The measured output given to the most recent call to @c run()
+        self.latest_output = 0
+        
+        # Ring buffers of times in milliseconds and measured outputs
+        self._log_size = log_size
+        self._log_idx = 0
+        self._log_count = 0
+        self.times = array('l', [0] * log_size)
+        self.motor_positions = array('l', [0] * log_size)
         
     def __repr__(self):
-        return f'CLPController(Kp={self.Kp}, init_setpoint={self.init_setpoint})'
+        return f'CLPController(Kp={self.Kp}, setpoint={self.setpoint})'
     
     def __str__(self):
-        return f'Closed-loop proportional controller:\n\tKp={self.Kp} and\n\tinit_setpoint={self.init_setpoint}'
+        return f'Closed-loop proportional controller:\n\tKp={self.Kp} and\n\tsetpoint={self.setpoint}'
 
-    def run (self, setpoint, meas_output):
+    def run (self, setpoint, meas_output, time = None):
         """!
         Run the closed loop proportional controller.
         @param  setpoint The setpoint for the controller
         @param  meas_output The measured output value
+        @param  time The time of the measurement in milliseconds, used only
+                when logging; if not given, @c utime.ticks_ms() is used
         @return The control output calculated by the controller
         """
-        self.motor_positions.append(meas_output)
-        return self.Kp * (setpoint - meas_output)
+        self.latest_output = meas_output
+        if self._log_size:
+            self._log(meas_output, time)
+        if not self._fixed:
+            return self.Kp * (setpoint - meas_output)
+
+        # A gain of 0 always gives 0. Otherwise errors beyond the threshold
+        # saturate the output; checking them first keeps the product small
+        # enough not to need a long integer
+        if not self._kp_q:
+            return 0
+        error = setpoint - meas_output
+        if self._kp_neg:
+            error = -error
+        if error >= self._err_max:
+            return OUT_LIMIT
+        if error <= -self._err_max:
+            return -OUT_LIMIT
+        if error < 0:
+            return -((self._kp_q * -error) >> Q_BITS)
+        return (self._kp_q * error) >> Q_BITS
+    
+    def _log(self, meas_output, time):
+        """!
+        Save a sample in the ring buffer, overwriting the oldest one if the
+        buffer is full.
+        @param  meas_output The measured output value
+        @param  time The time of the measurement in milliseconds, or @c None
+        """
+        idx = self._log_idx
+        self.times[idx] = utime.ticks_ms() if time is None else time
+        self.motor_positions[idx] = meas_output
+        idx += 1
+        self._log_idx = 0 if idx >= self._log_size else idx
+        if self._log_count < self._log_size:
+            self._log_count += 1
     
     def set_setpoint(self, new_setpoint):
         """!
@@ -48,19 +117,60 @@ class CLPController:
         Set a new value for Kp.
         @param new_Kp The new value for the proportional gain
         """
+        if self._fixed:
+            # The size of the gain is kept in fixed point and its sign is
+            # applied to the error
+            kp_q = int(abs(new_Kp) * (1 << Q_BITS) + 0.5)
+            if new_Kp and not kp_q:
+                raise ValueError(f"Kp={new_Kp} rounds to 0 in fixed point; "
+                                 f"its size must be at least "
+                                 f"{1 / (2 << Q_BITS)}")
+            self._kp_q = kp_q
+            self._kp_neg = new_Kp < 0
+            # The smallest error for which the output is saturated; it isn't
+            # used when the gain is 0
+            self._err_max = (((OUT_LIMIT << Q_BITS) + kp_q - 1) // kp_q
+                             if kp_q else 0)
         self.Kp = new_Kp
         
-    def print_response(self):
+    def clear_log(self):
+        """!
+        Empty the log of samples.
+        """
+        self._log_idx = 0
+        self._log_count = 0
+        
+    def samples(self, num = None):
+        """!
+        Generator which gives the most recent samples in the log, oldest first.
+        @param num The number of samples wanted, or @c None for all of the
+               samples in the log
+        @return Tuples of (time, measured output) for each sample
+        """
+        count = self._log_count
+        if num is not None and num < count:
+            count = num
+        idx = self._log_idx - count
+        if idx < 0:
+            idx += self._log_size
+        for _ in range(count):
+            yield self.times[idx], self.motor_positions[idx]
+            idx += 1
+            if idx >= self._log_size:
+                idx = 0
+        
+    def print_response(self, num = None):
         """!
-        Print the response of the controller.
+        Print the response of the controller, one sample at a time.
+        @param num The number of most recent samples to print, or @c None to
+               print all of the samples in the log
         """
-        if not self.times or not self.motor_positions:
+        if not self._log_count:
             print('No data available.')
             return
         
-        for time, position in zip(self.times, self.motor_positions):
+        for time, position in self.samples(num):
             print(f'{time}, {position}')
         
 if __name__ == "__main__":
     pass
-    
\ No newline at end of file
@@ -28,11 +28,55 @@ ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
 SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
-import gc                              # Memory allocation garbage collector
+import array                           # Compact arrays for trace data
 import utime                           # Micropython version of time library
 import micropython                     # This shuts up incorrect warnings
 
 
+## The names of the policies for handling a periodic task which is so late
+#  that one or more of its later run times have also passed. With 
+#  @c catch_up, the task is run once for each missed run time, back to back;
+#  with @c skip_missed, the task is run once and its next run time is moved
+#  to the next time that's on its schedule; with @c drop_and_count, the late
+#  run is dropped entirely and the task next runs at the next scheduled time.
+OVERRUN_POLICIES = ('catch_up', 'skip_missed', 'drop_and_count')
+
+## The number of buckets in each profiling histogram. Bucket @c n counts times
+#  of at least 2<sup>n-1</sup> and less than 2<sup>n</sup> microseconds, with
+#  bucket 0 counting times of zero and the last bucket counting all long times.
+HIST_BUCKETS = 24
+
+
+@micropython.native
+def _hist_bucket(value):
+    """!
+    Find the histogram bucket for a time in microseconds. This is the number
+    of bits needed to hold the time, found with a few comparisons.
+    @param value The time in microseconds
+    @return The index of the bucket in which to count the time
+    """
+    if value <= 0:
+        return 0
+    bucket = 1
+    if value >= 0x10000:
+        value >>= 16
+        bucket += 16
+    if value >= 0x100:
+        value >>= 8
+        bucket += 8
+    if value >= 0x10:
+        value >>= 4
+        bucket += 4
+    if value >= 0x4:
+        value >>= 2
+        bucket += 2
+    if value >= 0x2:
+        bucket += 1
+    if bucket >= HIST_BUCKETS:
+        bucket = HIST_BUCKETS - 1
+    return bucket
+
+
 class Task:
     """!
     Implements multitasking with scheduling and some performance logging.
@@ -66,11 +110,16 @@ class Task:
           while True: 
               cotask.task_list.pri_sched ()
       @endcode
+
+    When there are many timed tasks, @c cotask.task_list.heap_sched() can be
+    called instead of @c pri_sched() so that only tasks which are due to run
+    are checked.
       """
 
 
     def __init__(self, run_fun, name="NoName", priority=0, period=None,
-                 profile=False, trace=False, shares=()):
+                 profile=False, trace=False, shares=(), trace_size=100,
+                 overrun='catch_up'):
         """!
         Initialize a task object so it may be run by the scheduler.
 
@@ -87,11 +136,23 @@ class Task:
                run by a timer or @c None if the task is not run by a timer.
                The time can be given in a @c float or @c int; it will be 
                converted to microseconds for internal use by the scheduler.
-        @param profile Set to @c True to enable run-time profiling 
-        @param trace Set to @c True to generate a list of transitions between
-               states. @b Note: This slows things down and allocates memory.
+        @param profile Set to @c True to enable run-time profiling of every
+               run, to an integer @c N greater than one to time only every
+               @c N th run, or to a fraction between zero and one to time
+               randomly chosen runs at about that rate. Sampling keeps the
+               cost of profiling low enough to leave it on in production
+        @param trace Set to @c True to keep a record of transitions between
+               states. @b Note: This slows things down a little.
         @param shares A list or tuple of shares and queues used by this task.
                If no list is given, no shares are passed to the task
+        @param trace_size The number of state transitions which are kept in
+               the trace; when it's full, the oldest ones are overwritten
+        @param overrun What to do when a timed task is so late that it has
+               missed further run times; one of the names in 
+               @c OVERRUN_POLICIES, by default @c catch_up. The number of
+               overruns is shown in the task's diagnostic printout; it
+               counts late runs when catching up and missed run times
+               otherwise. Dropped runs are counted separately
         """
         # The function which is run to implement this task's code. Since it 
         # is a generator, we "run" it here, which doesn't actually run it but
@@ -120,25 +181,60 @@ class Task:
             self.period = period
             self._next_run = None
 
+        # The policy for missed run times, as an index into OVERRUN_POLICIES
+        if overrun not in OVERRUN_POLICIES:
+            raise ValueError(f"Unknown overrun policy '{overrun}'")
+        self._overrun = OVERRUN_POLICIES.index(overrun)
+
         # Flag which causes the task to be profiled, in which the execution
         #  time of the @c run() method is measured and basic statistics kept. 
-        self._prof = profile
+        #  Histograms of run times, lateness and the times between runs are
+        #  allocated here so that keeping them doesn't allocate memory. They
+        #  are made even if profiling is off, as it may be turned on later
+        self._prof = bool(profile)
+        self._sample_every = 1
+        self._sample_rand = False
+        if profile is True or not profile:
+            pass
+        elif isinstance(profile, float) and profile < 1.0:
+            self._sample_every = int(1.0 / profile + 0.5)
+            self._sample_rand = True
+        elif profile > 1:
+            self._sample_every = int(profile)
+        self._rand = 1
+        self._hist_run = array.array('L', range(HIST_BUCKETS))
+        self._hist_late = array.array('L', range(HIST_BUCKETS))
+        self._hist_period = array.array('L', range(HIST_BUCKETS))
         self.reset_profile()
 
         # The previous state in which the task last ran. It is used to watch
         # for and track state transitions.
         self._prev_state = 0
 
-        # If transition tracing has been enabled, create an empty list in 
-        # which to store transition (time, to-state) stamps
+        # If transition tracing has been enabled, allocate a ring buffer in
+        # which to store the time since the previous transition and the
+        # to-state of each transition. The buffer is made of two arrays so no
+        # memory is allocated as transitions are recorded. The times of
+        # transitions which have been overwritten are added up in whole
+        # milliseconds and leftover microseconds, which stay small integers
         self._trace = trace
-        self._tr_data = []
-        self._prev_time = utime.ticks_us()
+        if trace:
+            self._tr_times = array.array('l', range(trace_size))
+            self._tr_states = array.array('l', range(trace_size))
+        self._tr_size = trace_size
+        self._tr_idx = 0
+        self._tr_count = 0
+        self._tr_prev = utime.ticks_us()
+        self._tr_lost_ms = 0
+        self._tr_lost_us = 0
 
         ## Flag which is set true when the task is ready to be run by the
         #  scheduler
         self.go_flag = False
 
+        # The number of runs requested by post() which haven't been done yet
+        self._posts = 0
+
 
     def schedule(self) -> bool:
         """!
@@ -150,50 +246,91 @@ class Task:
         @return @c True if the task ran or @c False if it did not
         """
         if self.ready():
+            self._run()
+            return True
 
-            # Reset the go flag for the next run
-            self.go_flag = False
+        else:
+            return False
 
-            # If profiling, save the start time
-            if self._prof:
-                stime = utime.ticks_us()
 
-            # Run the method belonging to the state which should be run next
-            curr_state = next(self._run_gen)
-
-            # If profiling or tracing, save timing data
-            if self._prof or self._trace:
-                etime = utime.ticks_us()
-
-            # If profiling, save timing data
-            if self._prof:
-                self._runs += 1
-                runt = utime.ticks_diff(etime, stime)
-                if self._runs > 2:
-                    self._run_sum += runt
-                    if runt > self._slowest:
-                        self._slowest = runt
-
-            # If transition logic tracing is on, record a transition; if not,
-            # ignore the state. If out of memory, switch tracing off and 
-            # run the memory allocation garbage collector
-            if self._trace:
-                try:
-                    if curr_state != self._prev_state:
-                        self._tr_data.append(
-                            (utime.ticks_diff(etime, self._prev_time),
-                             curr_state))
-                except MemoryError:
-                    self._trace = False
-                    gc.collect()
-
-                self._prev_state = curr_state
-                self._prev_time = etime
+    def _run(self):
+        """!
+        Run the task's generator up to its next @c yield() right away.
+        This method is used by @c schedule() once it has found that the task
+        is ready, and by schedulers which have already called @c ready().
+        """
+        # Reset the go flag for the next run, unless more runs have been
+        # requested by calls to post()
+        if self._posts > 1:
+            self._posts -= 1
+        else:
+            self._posts = 0
+            self.go_flag = False
 
-            return True
+        # If profiling, count the run, and if this run is one of those to be
+        # timed, save the start time. When sampling at random, the number of
+        # runs until the next sample is taken from a small random generator
+        sample = False
+        if self._prof:
+            self._runs += 1
+            self._countdown -= 1
+            if self._countdown <= 0:
+                sample = True
+                if self._sample_rand:
+                    self._rand = (self._rand * 75 + 74) % 65537
+                    self._countdown = 1 + self._rand \
+                        % (2 * self._sample_every - 1)
+                else:
+                    self._countdown = self._sample_every
+                stime = utime.ticks_us()
 
-        else:
-            return False
+        # Run the method belonging to the state which should be run next
+        curr_state = next(self._run_gen)
+
+        # If profiling or tracing, save timing data
+        if sample or self._trace:
+            etime = utime.ticks_us()
+
+        # If this run is being profiled, save timing data. The time between
+        # runs is only known if the previous run was also timed
+        if sample:
+            runt = utime.ticks_diff(etime, stime)
+            if self._runs > 2:
+                self._samples += 1
+                self._run_sum += runt
+                if runt > self._slowest:
+                    self._slowest = runt
+                self._hist_run[_hist_bucket(runt)] += 1
+            if self._runs > 1 and self._last_sample == self._runs - 1:
+                period = utime.ticks_diff(stime, self._last_start)
+                if period > self._longest:
+                    self._longest = period
+                self._hist_period[_hist_bucket(period)] += 1
+            self._last_start = stime
+            self._last_sample = self._runs
+
+        # If transition logic tracing is on, record a transition in the ring
+        # buffer, overwriting the oldest one if the buffer is full. Only the
+        # time since the previous transition is kept, so the trace stays
+        # right however long the task runs
+        if self._trace:
+            if curr_state != self._prev_state:
+                idx = self._tr_idx
+                if self._tr_count < self._tr_size:
+                    self._tr_count += 1
+                else:
+                    lost = self._tr_lost_us + self._tr_times[idx]
+                    self._tr_lost_ms += lost // 1000
+                    self._tr_lost_us = lost % 1000
+                self._tr_times[idx] = utime.ticks_diff(etime, self._tr_prev)
+                self._tr_states[idx] = curr_state
+                self._tr_prev = etime
+                idx += 1
+                if idx >= self._tr_size:
+                    idx = 0
+                self._tr_idx = idx
+
+            self._prev_state = curr_state
 
 
     @micropython.native
@@ -210,15 +347,33 @@ class Task:
         if self.period != None:
             late = utime.ticks_diff(utime.ticks_us(), self._next_run)
             if late > 0:
+                # If later run times have passed too, it's an overrun. When
+                # catching up, each run which starts that late is counted;
+                # otherwise the missed run times are counted and skipped
+                if late > self.period:
+                    if self._overrun:
+                        missed = (late - 1) // self.period
+                        self._overruns += missed
+                        self._next_run = utime.ticks_diff(
+                            (missed + 1) * self.period, -self._next_run)
+                        if self._overrun == 2:
+                            self._dropped += 1
+                            return self.go_flag
+                    else:
+                        self._overruns += 1
+                        self._next_run = utime.ticks_diff(self.period, 
+                                                          -self._next_run)
+                else:
+                    self._next_run = utime.ticks_diff(self.period, 
+                                                      -self._next_run)
                 self.go_flag = True
-                self._next_run = utime.ticks_diff(self.period, 
-                                                  -self._next_run)
 
                 # If keeping a latency profile, record the data
                 if self._prof:
                     self._late_sum += late
                     if late > self._latest:
                         self._latest = late
+                    self._hist_late[_hist_bucket(late)] += 1
 
         # If the task doesn't use a timer, we rely on go_flag to signal ready
         return self.go_flag
@@ -243,32 +398,75 @@ class Task:
         This method is also used by @c __init__() to create the variables.
         """
         self._runs = 0
+        self._samples = 0
+        self._countdown = 1
+        self._last_sample = 0
         self._run_sum = 0
         self._slowest = 0
         self._late_sum = 0
         self._latest = 0
+        self._longest = 0
+        self._last_start = 0
+        self._overruns = 0
+        self._dropped = 0
+        for idx in range(HIST_BUCKETS):
+            self._hist_run[idx] = 0
+            self._hist_late[idx] = 0
+            self._hist_period[idx] = 0
 
 
-    def get_trace(self):
+    def iter_trace(self):
         """!
-        This method returns a string containing the task's transition trace.
-        The trace is a set of tuples, each of which contains a time and the
-        states from and to which the system transitioned. 
-        @return A possibly quite large string showing state transitions
+        This generator produces the lines of the task's transition trace one
+        at a time, so that a long trace can be printed without building it
+        into one string. The first line holds the task's name; each of the
+        others shows the time in seconds since the task was created and the
+        states from and to which the task transitioned. If older transitions
+        have been overwritten, the trace begins at the oldest one for which
+        the previous state is still known. Times stay right for as long as
+        the task runs, provided that transitions come less than about 500 s
+        apart, the longest time which @c utime.ticks_diff() can measure.
+        @code
+        for line in task1.iter_trace():
+            print(line)
+        @endcode
         """
-        tr_str = 'Task ' + self.name + ':'
-        if self._trace:
-            tr_str += '\n'
+        if not self._trace and self._tr_count == 0:
+            yield 'Task ' + self.name + ': not traced'
+            return
+
+        yield 'Task ' + self.name + ':'
+        count = self._tr_count
+        idx = self._tr_idx - count
+        if idx < 0:
+            idx += self._tr_size
+        total_time = self._tr_lost_ms / 1000.0 + self._tr_lost_us / 1000000.0
+        if count < self._tr_size:
             last_state = 0
-            total_time = 0.0
-            for item in self._tr_data:
-                total_time += item[0] / 1000000.0
-                tr_str += '{: 12.6f}: {: 2d} -> {:d}\n'.format (total_time, 
-                    last_state, item[1])
-                last_state = item[1]
         else:
-            tr_str += ' not traced'
-        return tr_str
+            total_time += self._tr_times[idx] / 1000000.0
+            last_state = self._tr_states[idx]
+            idx += 1
+            count -= 1
+        for _ in range(count):
+            if idx >= self._tr_size:
+                idx = 0
+            total_time += self._tr_times[idx] / 1000000.0
+            state = self._tr_states[idx]
+            yield '{: 12.6f}: {: 2d} -> {:d}'.format(total_time,
+                                                       last_state, state)
+            last_state = state
+            idx += 1
+
+
+    def get_trace(self):
+        """!
+        This method returns a string containing the task's transition trace.
+        Each line contains a time and the states from and to which the task
+        transitioned. Use @c iter_trace() to print a long trace.
+        @return A string showing state transitions
+        """
+        return '\n'.join(self.iter_trace())
 
 
     def go(self):
@@ -280,6 +478,75 @@ class Task:
         self.go_flag = True
 
 
+    def post(self):
+        """!
+        Method to ask for one more run of this task.
+        Unlike @c go(), which makes the task run once no matter how many times
+        it's called before the task runs, each call to this method causes one
+        run of the task. This is used when each of several events needs its
+        own run, such as each new item of data put into a share.
+        """
+        self._posts += 1
+        self.go_flag = True
+
+
+    @staticmethod
+    def _percentile(hist, fraction):
+        """!
+        Estimate a percentile of the times counted in a histogram.
+        @param hist The histogram, an array of counts in each bucket
+        @param fraction The fraction of the times which are at or below the
+               percentile, such as 0.95 for the 95th percentile
+        @return The upper limit in microseconds of the bucket holding the
+                percentile, or 0 if the histogram is empty
+        """
+        total = 0
+        for count in hist:
+            total += count
+        if total == 0:
+            return 0
+        target = total * fraction
+        running = 0
+        for bucket in range(HIST_BUCKETS):
+            running += hist[bucket]
+            if running >= target:
+                return 1 << bucket if bucket > 0 else 0
+        return 1 << (HIST_BUCKETS - 1)
+
+
+    def hist_repr(self):
+        """!
+        This method makes a few lines of diagnostic text showing percentiles
+        of the task's run times, lateness and times between runs. Percentiles
+        are found from histograms with buckets whose sizes double, so they
+        show the upper limit of the bucket in which each one falls or the
+        maximum if that's less; maximums are exact. All times are in
+        milliseconds. When profiling samples only some runs, times between
+        runs are only kept for pairs of runs which were both timed.
+        @return A string with one line for each histogram, or an empty string
+                if the task isn't profiled
+        """
+        if not self._prof:
+            return ''
+        rows = (('run', self._hist_run, self._slowest),
+                ('late', self._hist_late, self._latest),
+                ('period', self._hist_period, self._longest))
+        rst = ''
+        name = self.name
+        for label, hist, most in rows:
+            if label == 'late' and self.period is None:
+                continue
+            rst += f"{name:<16s}{label:<8s}"
+            for fraction in (0.5, 0.95, 0.99):
+                pct = self._percentile(hist, fraction)
+                if pct > most:
+                    pct = most
+                rst += f"{(pct / 1000.0): 10.3f}"
+            rst += f"{(most / 1000.0): 10.3f}\n"
+            name = ''
+        return rst
+
+
     def __repr__(self):
         """!
         This method converts the task to a string for diagnostic use.
@@ -294,11 +561,16 @@ class Task:
         rst += f"{self._runs: 8d}"
 
         if self._prof and self._runs > 0:
-            avg_dur = (self._run_sum / self._runs) / 1000.0
+            avg_dur = (self._run_sum / self._samples) / 1000.0 \
+                if self._samples > 0 else 0.0
             avg_late = (self._late_sum / self._runs) / 1000.0
             rst += f"{avg_dur: 10.3f}{(self._slowest / 1000.0): 10.3f}"
             if self.period != None:
                 rst += f"{avg_late: 10.3f}{(self._latest / 1000.0): 10.3f}"
+        if self.period != None:
+            if not self._prof or self._runs == 0:
+                rst += ' ' * 40
+            rst += f"{self._overruns: 9d}{self._dropped: 9d}"
         return rst
 
 
@@ -316,7 +588,9 @@ class TaskList:
     The task list is sorted by priority so that the scheduler can efficiently
     look through the list to find the highest priority task which is ready to
     run at any given time. Tasks can also be scheduled in a simpler
-    "round-robin" fashion.
+    "round-robin" fashion. Timed tasks are also kept in a heap ordered by
+    their next run times, so that @c heap_sched() can find a task which is
+    due without checking the time for every task in the list.
     """
 
     def __init__(self):
@@ -330,6 +604,25 @@ class TaskList:
         #  that priority. 
         self.pri_list = []
 
+        # A binary min-heap of the tasks which run on a timer, ordered by
+        # their next run times with ties going to the higher priority task
+        self._heap = []
+
+        # Tasks which are run by calls to go() rather than by a timer, sorted
+        # from highest to lowest priority
+        self._trig_list = []
+
+        # Times in milliseconds used by run_forever() to measure how much
+        # time is spent idle
+        self._idle_sum = 0
+        self._run_time = None
+
+        # Set while heap_sched() is the scheduler, which keeps the heap in
+        # order so that the next timed task to run is always at its top. The
+        # other schedulers clear it, since they move tasks' run times without
+        # fixing the heap
+        self._heap_ordered = False
+
 
     def append(self, task):
         """!
@@ -357,6 +650,15 @@ class TaskList:
         # Make sure the main list (of lists at each priority) is sorted
         self.pri_list.sort(key=lambda pri: pri[0], reverse=True)
 
+        # Put the task into the heap of timed tasks or the list of triggered
+        # tasks used by heap_sched()
+        if task.period != None:
+            self._heap.append(task)
+            self._heap_up(len(self._heap) - 1)
+        else:
+            self._trig_list.append(task)
+            self._trig_list.sort(key=lambda tsk: tsk.priority, reverse=True)
+
 
     @micropython.native
     def rr_sched(self):
@@ -371,6 +673,8 @@ class TaskList:
         about the same amount of time before each is given a chance to run 
         again.
         """
+        self._heap_ordered = False
+
         # For each priority level, run all tasks at that level
         for pri in self.pri_list:
             for task in pri[2:]:
@@ -386,6 +690,8 @@ class TaskList:
         called, it finds the highest priority task which is ready to run and
         calls that task's @c run() method.
         """
+        self._heap_ordered = False
+
         # Go down the list of priorities, beginning with the highest
         for pri in self.pri_list:
             # Within each priority list, run tasks in round-robin order
@@ -403,16 +709,408 @@ class TaskList:
                     return
 
 
+    @micropython.native
+    def edf_sched(self):
+        """!
+        Run tasks according to their deadlines.
+
+        This scheduler runs the ready task with the earliest deadline first.
+        The deadline of a timed task is taken to be the end of its current
+        period, which is the time at which it would next be made ready. Tasks
+        which are not run on a timer have no deadline and are only run when
+        no timed task is ready; among them, and among timed tasks with equal
+        deadlines, the highest priority task runs first.
+        """
+        self._heap_ordered = False
+
+        best = None
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                if task.go_flag or task.ready():
+                    if best is None:
+                        best = task
+                    elif task.period != None and (best.period is None
+                            or utime.ticks_diff(task._next_run,
+                                                best._next_run) < 0):
+                        best = task
+        if best != None:
+            best._run()
+
+
+    def rate_monotonic(self):
+        """!
+        Assign task priorities according to the rate monotonic rule.
+
+        Timed tasks are given priorities in order of their periods, with the
+        shortest period getting the highest priority and tasks of equal
+        periods sharing a priority. The timed tasks' priorities are placed
+        above those of tasks which have no period, which keep the priorities
+        they were given. The task list is then rebuilt in the new order.
+        """
+        tasks = [task for pri in self.pri_list for task in pri[2:]]
+
+        base = 0
+        for task in self._trig_list:
+            if task.priority >= base:
+                base = task.priority + 1
+
+        periods = sorted(set(task.period for task in self._heap),
+                         reverse=True)
+        for task in self._heap:
+            task.priority = base + periods.index(task.period)
+
+        self.pri_list = []
+        self._heap = []
+        self._trig_list = []
+        for task in tasks:
+            self.append(task)
+
+
+    def check_schedule(self, edf=False):
+        """!
+        Check whether the tasks in the list can be expected to meet their
+        deadlines.
+
+        The run times used are the slowest ones measured by profiling, so the
+        tasks must have been created with profiling enabled and run for a
+        while, for instance with @c run_forever() given a @c duration, before
+        this method is called. The deadline of each task is its period. 
+        
+        The total processor utilization of the timed tasks must not exceed
+        one. For priority scheduling, the worst case response time of each
+        task is then found by response time analysis for non-preemptive
+        scheduling: a task may have to wait for one run of the slowest lower
+        priority task to finish, and for as many runs of each task of equal
+        or higher priority as can be released while it waits. For earliest
+        deadline first scheduling, each task may be blocked by one run of the
+        slowest task with a longer period. A warning is printed for each
+        task which might miss its deadline.
+
+        @param edf @c True to check for @c edf_sched(), @c False (the default)
+               to check for @c pri_sched()
+        @return @c True if all tasks should meet their deadlines, @c False if
+                any might not or if some tasks have no profiling data
+        """
+        tasks = [task for pri in self.pri_list for task in pri[2:]]
+        ok = True
+        for task in tasks:
+            if not task._prof or task._samples == 0:
+                print(f"Warning: {task.name} has no profile data")
+                ok = False
+        if not ok:
+            return False
+
+        util = 0.0
+        for task in self._heap:
+            util += task._slowest / task.period
+        if util > 1.0:
+            print(f"Warning: utilization {(util * 100.0):.1f}% is over 100%")
+            return False
+
+        for task in self._heap:
+            if edf:
+                block = 0
+                for other in self._heap:
+                    if other.period > task.period and other._slowest > block:
+                        block = other._slowest
+                if util + block / task.period > 1.0:
+                    print(f"Warning: {task.name} may be blocked past its "
+                          "deadline")
+                    ok = False
+                continue
+
+            # The longest time a lower priority task can hold the processor
+            block = 0
+            for other in tasks:
+                if other.priority < task.priority and other._slowest > block:
+                    block = other._slowest
+
+            # Iterate on the time spent waiting to start until it settles
+            wait = block
+            while True:
+                new_wait = block
+                for other in tasks:
+                    if other is task or other.priority < task.priority:
+                        continue
+                    if other.period is None:
+                        new_wait += other._slowest
+                    else:
+                        new_wait += (wait // other.period + 1) \
+                            * other._slowest
+                if new_wait == wait or new_wait + task._slowest > task.period:
+                    wait = new_wait
+                    break
+                wait = new_wait
+
+            response = wait + task._slowest
+            if response > task.period:
+                print(f"Warning: {task.name} may respond in "
+                      f"{(response / 1000.0):.3f} ms, longer than its "
+                      f"{(task.period / 1000.0):.1f} ms period")
+                ok = False
+
+        return ok
+
+
+    @micropython.native
+    def heap_sched(self):
+        """!
+        Run tasks in order of their next run times.
+
+        This scheduler keeps the tasks which run on a timer in a heap sorted
+        by the time at which each task is next due to run, so each call only
+        reads the clock once and looks at the task at the top of the heap
+        rather than asking every task whether it's ready. If the earliest
+        task is due, it is run and moved down the heap to its new place;
+        tasks which are due at the same time run in order of priority.
+        Tasks with no period are run when their @c go() methods have been
+        called; such a task runs first if its priority is higher than that of
+        the timed task which is due. 
+
+        Timed tasks are only run when they are due, so calling the @c go()
+        method of a task which has a period has no effect with this
+        scheduler. Tasks should not be switched between timed and triggered
+        operation with @c set_period() after they've been added to the list.
+        """
+        # If another scheduler has been used, the heap may be out of order
+        if not self._heap_ordered:
+            for index in range(len(self._heap) // 2 - 1, -1, -1):
+                self._heap_down(index)
+            self._heap_ordered = True
+
+        # Find the highest priority triggered task which is ready, if any
+        trig = None
+        for task in self._trig_list:
+            if task.go_flag:
+                trig = task
+                break
+
+        heap = self._heap
+        if heap:
+            top = heap[0]
+            if utime.ticks_diff(utime.ticks_us(), top._next_run) > 0:
+                if trig != None and trig.priority > top.priority:
+                    trig.schedule()
+                else:
+                    top.schedule()
+                    self._heap_down(0)
+                return
+
+        if trig != None:
+            trig.schedule()
+
+
+    @micropython.native
+    def _heap_before(self, task_a, task_b) -> bool:
+        """!
+        Check if one task belongs above another in the heap of timed tasks.
+        Run times are compared with @c ticks_diff() so that the order stays
+        correct when the microsecond timer wraps around.
+        @param task_a The first task to compare
+        @param task_b The second task to compare
+        @return @c True if @c task_a should run before @c task_b
+        """
+        diff = utime.ticks_diff(task_a._next_run, task_b._next_run)
+        if diff == 0:
+            return task_a.priority > task_b.priority
+        return diff < 0
+
+
+    @micropython.native
+    def _heap_up(self, index):
+        """!
+        Move the task at the given index up the heap to where it belongs.
+        @param index The index in the heap of the task to be moved
+        """
+        heap = self._heap
+        task = heap[index]
+        while index > 0:
+            parent = (index - 1) >> 1
+            if not self._heap_before(task, heap[parent]):
+                break
+            heap[index] = heap[parent]
+            index = parent
+        heap[index] = task
+
+
+    @micropython.native
+    def _heap_down(self, index):
+        """!
+        Move the task at the given index down the heap to where it belongs.
+        @param index The index in the heap of the task to be moved
+        """
+        heap = self._heap
+        length = len(heap)
+        task = heap[index]
+        while True:
+            child = 2 * index + 1
+            if child >= length:
+                break
+            if child + 1 < length \
+                    and self._heap_before(heap[child + 1], heap[child]):
+                child += 1
+            if not self._heap_before(heap[child], task):
+                break
+            heap[index] = heap[child]
+            index = child
+        heap[index] = task
+
+
+    def time_to_next(self, now=None):
+        """!
+        Find how long it will be until a task needs to be run.
+
+        This method looks through the timed tasks for the one which is due to
+        run soonest and checks the go flags of all tasks. When @c heap_sched()
+        is the scheduler, the soonest timed task is the one at the top of its
+        heap and only the triggered tasks' go flags matter, so the other
+        timed tasks aren't looked at.
+        @param now The current time from @c utime.ticks_us(), or @c None to
+               read the time here
+        @return The number of microseconds until the next task is due, zero
+                if a task is ready to run now, or @c None if no task has a
+                period and none has had its @c go() method called
+        """
+        for task in self._trig_list:
+            if task.go_flag:
+                return 0
+
+        if now is None:
+            now = utime.ticks_us()
+        if self._heap_ordered:
+            if not self._heap:
+                return None
+            wait = utime.ticks_diff(self._heap[0]._next_run, now) + 1
+            return wait if wait > 0 else 0
+
+        wait = None
+        for task in self._heap:
+            if task.go_flag:
+                return 0
+            # A task is run once the time is strictly past its run time
+            diff = utime.ticks_diff(task._next_run, now) + 1
+            if wait is None or diff < wait:
+                wait = diff
+        if wait != None and wait < 0:
+            wait = 0
+        return wait
+
+
+    def run_forever(self, sched=None, idle=None, max_idle=1000,
+                    duration=None):
+        """!
+        Run the scheduler, resting between task runs instead of spinning.
+
+        Each time through the loop, this method finds how long it will be
+        until the next task is due. If no task is ready, the @c idle function
+        is called to wait for that time, or for @c max_idle microseconds if
+        that's shorter, so that a task whose @c go() method is called from an
+        interrupt is noticed soon. Otherwise the scheduler is called. The
+        fraction of the time spent idle is kept and shown in the diagnostic
+        printout of the task list.
+
+        On the board, a low power wait which wakes up at the next interrupt
+        (the system tick interrupt occurs every millisecond) is as follows:
+        @code
+        cotask.task_list.run_forever(idle=lambda us: pyb.wfi())
+        @endcode
+
+        @param sched The scheduler method to call, by default @c pri_sched
+        @param idle A function which waits for the number of microseconds
+               it is given or less; it defaults to @c utime.sleep_us
+        @param max_idle The longest time in microseconds for which @c idle is
+               asked to wait at once
+        @param duration The number of microseconds to run before returning,
+               or @c None (the default) to run until an exception occurs
+        """
+        if sched is None:
+            sched = self.pri_sched
+        if idle is None:
+            idle = utime.sleep_us
+
+        # The running time is added up a bit at a time because differences
+        # between tick values are only valid for half the timer's range. The
+        # totals are kept in milliseconds, with the leftover microseconds
+        # kept apart, so that they stay small integers for days and adding
+        # to them doesn't allocate memory
+        self._idle_sum = 0
+        self._run_time = 0
+        run_us = 0
+        idle_us = 0
+        if duration != None:
+            dur_ms = duration // 1000
+            dur_us = duration - dur_ms * 1000
+        last = utime.ticks_us()
+        while True:
+            now = utime.ticks_us()
+            run_us += utime.ticks_diff(now, last)
+            last = now
+            if run_us >= 1000:
+                msec = run_us // 1000
+                self._run_time += msec
+                run_us -= msec * 1000
+            if duration != None and (self._run_time > dur_ms
+                                     or (self._run_time == dur_ms
+                                         and run_us >= dur_us)):
+                return
+
+            wait = self.time_to_next(now)
+            if wait is None or wait > max_idle:
+                wait = max_idle
+            if wait > 0:
+                idle(wait)
+                idle_us += utime.ticks_diff(utime.ticks_us(), now)
+                if idle_us >= 1000:
+                    msec = idle_us // 1000
+                    self._idle_sum += msec
+                    idle_us -= msec * 1000
+            else:
+                sched()
+
+
+    def idle_fraction(self):
+        """!
+        Find the fraction of the time spent idle while @c run_forever() ran.
+        @return The idle time divided by the total running time, or @c None
+                if @c run_forever() hasn't been run
+        """
+        if self._run_time is None:
+            return None
+        if self._run_time <= 0:
+            return 0.0
+        return self._idle_sum / self._run_time
+
+
     def __repr__(self):
         """!
         Create some diagnostic text showing the tasks in the task list.
         """
         ret_str = 'TASK             PRI    PERIOD    RUNS   AVG DUR   MAX ' \
-            'DUR  AVG LATE  MAX LATE\n'
+            'DUR  AVG LATE  MAX LATE  OVERRUN  DROPPED\n'
         for pri in self.pri_list:
             for task in pri[2:]:
                 ret_str += str(task) + '\n'
 
+        idle = self.idle_fraction()
+        if idle != None:
+            ret_str += f"Idle {(idle * 100.0):.1f}%\n"
+
+        return ret_str
+
+
+    def hist_repr(self):
+        """!
+        Create diagnostic text showing how the run times, lateness and times
+        between runs of the profiled tasks are distributed. This table is
+        printed alongside the one made by @c __repr__(); it shows whether a
+        task is steadily late or only occasionally very late.
+        """
+        ret_str = 'TASK            HIST          P50       P95       P99' \
+            '       MAX\n'
+        for pri in self.pri_list:
+            for task in pri[2:]:
+                ret_str += task.hist_repr()
+
         return ret_str
 
 
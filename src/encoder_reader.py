@@ -3,14 +3,88 @@
     main includes a test to make sure it works properly. 
 """
 import pyb
+import utime
+from array import array
+
+## The index of the position in the array returned by @c read_state()
+POS = 0
+## The index of the velocity in ticks per second in the state array
+VEL = 1
+## The index of the time of the sample, from @c utime.ticks_us(), in the state
+#  array
+TIME = 2
+## The index of the acceleration in ticks per second squared in the state
+#  array, which is only there if the reader was made with @c accel=True
+ACC = 3
+
+def setup_encoder (pin1, pin2, tim_num):
+    """!
+    Sets up a timer to count the pulses from an encoder.
+    @param pin1  First pin connecting the encoder to the motor.
+    @param pin2  Second pin connecting the encoder to the motor.
+    @param tim_num The number of the timer which counts the pulses
+    @return A tuple of the two pins and the timer
+    """
+    pin1 = pyb.Pin(pin1, pyb.Pin.IN) #change out_pp to in
+    pin2 = pyb.Pin(pin2, pyb.Pin.IN)
+    timer = pyb.Timer(tim_num, prescaler = 0, period = 0xFFFF)
+    timer.channel(1, pyb.Timer.ENC_AB, pin=pin1) 
+    timer.channel(2, pyb.Timer.ENC_AB, pin=pin2)
+    return pin1, pin2, timer
+
+def count_change (curr_count, prev_count):
+    """!
+    Finds how far an encoder moved between two readings of its 16 bit timer
+    counter, correcting for the counter overflowing or underflowing. The
+    encoder must move less than 32768 counts between the readings. This is
+    used by the interrupt sampling code, so it must not allocate memory.
+    @param curr_count The newer reading of the counter
+    @param prev_count The older reading of the counter
+    @return The change in position in encoder ticks
+    """
+    difference = curr_count - prev_count
+    if difference > 32768:
+        return difference - 65536
+    if difference < -32768:
+        return difference + 65536
+    return difference
+
+def per_second (change, dt_us):
+    """!
+    Divides a change by a time in microseconds to give a rate per second,
+    rounded down as @c change * 1000000 // dt_us would be. The division is
+    done in steps of 1000 so that no product is bigger than the rate or than
+    1000 times the time; while the time is under a second and the rate fits
+    in a small integer, no memory is allocated.
+    @param change The change in ticks, or in ticks per second
+    @param dt_us The time over which the change happened, in microseconds;
+           it must be more than 0
+    @return The rate of change per second
+    """
+    whole = change // dt_us
+    part = change % dt_us * 1000
+    return ((whole * 1000 + part // dt_us) * 1000
+            + part % dt_us * 1000 // dt_us)
 
 class EncoderReader:
     """! 
     This class implements an encoder reader for the ME 405 lab kit.
+
+    Every reading is timestamped, and the velocity is found from the change
+    in position over the last @c window readings, so it is right even when
+    the readings aren't evenly spaced. The position, velocity and time of
+    the latest reading are kept in an array which is allocated when the
+    reader is made, and is returned by @c read_state() without allocating
+    any memory.
+
+    The encoder can also be sampled by a timer interrupt at a fixed rate, so
+    that the samples aren't delayed by the scheduler and the counter is read
+    often enough never to miss a wrap, however late the tasks are. See
+    @c start_sampling().
     """
 
     def __init__ (self, pin1 = pyb.Pin.board.PC6, pin2 = pyb.Pin.board.PC7,
-                  tim_num: int = 8):
+                  tim_num: int = 8, window: int = 4, accel = False):
         """!
         Initializes an EncoderReader object.
         @param pin1  First pin connecting the encoder to the motor.
@@ -18,21 +92,36 @@ class EncoderReader:
         @param timer Selected controller timer to use for the encoder. The timer
                reads pulses from the encoder and counts the distance and 
                direction of motion.
+        @param window The number of readings over which the velocity is
+               found. A longer window gives a smoother velocity which lags
+               the motor more.
+        @param accel @c True to also estimate the acceleration, from the
+               change in velocity over the same window
         """
         
         #this is going to assume, for now, that we're only going to use/input 
         # the pins and timer that we know works/have already used for the 
         # encoder reader
-        self.pin1 = pyb.Pin(pin1, pyb.Pin.IN) #change out_pp to in
-        self.pin2 = pyb.Pin(pin2, pyb.Pin.IN)
-        self.timer = pyb.Timer(tim_num, prescaler = 0, period = 0xFFFF)
-
-        # self.pin1 = pyb.Pin(..)
-        self.timer.channel(1, pyb.Timer.ENC_AB, pin=self.pin1) 
-        self.timer.channel(2, pyb.Timer.ENC_AB, pin=self.pin2)
+        self.pin1, self.pin2, self.timer = setup_encoder(pin1, pin2, tim_num)
         
         self.curr_pos = 0
-        self.prev_count = 0
+        self.prev_count = self.timer.counter()
+        
+        # The state of the latest reading, and rings of the positions, times
+        # and velocities of the last few readings
+        now = utime.ticks_us()
+        self._accel = accel
+        self._state = array('l', [0, 0, now, 0] if accel else [0, 0, now])
+        self._window = window
+        self._win_idx = 0
+        self._win_pos = array('l', [0] * window)
+        self._win_time = array('l', [now] * window)
+        self._win_vel = array('l', [0] * window)
+        
+        # Set up by start_sampling() when a timer interrupt reads the encoder;
+        # the base is subtracted from the interrupt's position by zero()
+        self._smp_timer = None
+        self._base = 0
         
     def __repr__(self):
         """!
@@ -49,30 +138,298 @@ class EncoderReader:
     def read (self):
         """!
         Returns the current position of the motor.
+
+        When the encoder is being sampled by a timer interrupt, this takes
+        in the samples saved since the last call and returns the newest one.
         """
+        if self._smp_timer is not None:
+            self._drain(None, None)
+            return self.curr_pos
     
         curr_count = self.timer.counter()
-        difference = curr_count - self.prev_count
+        self.curr_pos += count_change(curr_count, self.prev_count)
+        self.prev_count = curr_count
+        self._update(self.curr_pos, utime.ticks_us())
         
-        if (difference) > (32768):
-            difference -= 65535
-            
-        if (difference) < -(32768):
-            difference += 65535
+        return self.curr_pos
+    
+    def read_state (self):
+        """!
+        Reads the encoder and returns the position, velocity and time of the
+        reading together.
+        @return An array holding the position in ticks, the velocity in ticks
+                per second and the time from @c utime.ticks_us(), at indices
+                @c POS, @c VEL and @c TIME, and the acceleration at @c ACC
+                if it is being estimated. The same array is returned by
+                every call.
+        """
+        self.read()
+        return self._state
+    
+    def velocity (self):
+        """!
+        Returns the velocity found at the latest reading, in ticks per second.
+        """
+        return self._state[VEL]
+    
+    def _update (self, pos, now):
+        """!
+        Saves a reading in the window and updates the state.
+        @param pos The position in ticks
+        @param now The time of the reading from @c utime.ticks_us()
+        """
+        state = self._state
+        idx = self._win_idx
+        
+        # The oldest reading in the window is replaced by this one. The
+        # velocity now and the one saved with that reading are each found
+        # over a window, so their centres are the window's time apart
+        dt = utime.ticks_diff(now, self._win_time[idx])
+        if dt > 0:
+            vel = per_second(pos - self._win_pos[idx], dt)
+            if self._accel:
+                state[ACC] = per_second(vel - self._win_vel[idx], dt)
+            state[VEL] = vel
+        
+        state[POS] = pos
+        state[TIME] = now
+        self._win_pos[idx] = pos
+        self._win_time[idx] = now
+        self._win_vel[idx] = state[VEL]
+        idx += 1
+        self._win_idx = 0 if idx >= self._window else idx
+    
+    def start_sampling (self, tim_num: int, freq: int, size: int = 32):
+        """!
+        Starts reading the encoder in a timer interrupt at a fixed rate.
+
+        Each sample's position and time are put into a ring buffer which is
+        allocated here; @c read(), @c read_state() and @c get_samples() take
+        them out. The interrupt is the only writer of the ring's head and
+        the task the only writer of its tail, so neither has to disable
+        interrupts. If the task falls so far behind that the ring fills, the
+        oldest samples are kept and new ones are counted as lost, but the
+        position is still updated, so no counts are ever lost.
+        Call @c micropython.alloc_emergency_exception_buf() first so that
+        errors in the interrupt can be reported.
+        @param tim_num The number of a free timer to make the interrupts
+        @param freq The sampling rate in Hz; it must be fast enough that the
+               encoder moves less than 32768 counts between samples
+        @param size The number of samples the ring buffer holds
+        """
+        self.stop_sampling()
+        self.read()
+        self._base = 0
+        self._isr_pos = self.curr_pos
+        self._isr_time = self._state[TIME]
+        self._smp_size = size + 1
+        self._smp_pos = array('l', [0] * (size + 1))
+        self._smp_time = array('l', [0] * (size + 1))
+        self._smp_head = 0
+        self._smp_tail = 0
+        self._smp_lost = 0
+        self._smp_timer = pyb.Timer(tim_num, freq=freq)
+        self._smp_timer.callback(self._sample)
         
-        self.curr_pos += difference
+    def stop_sampling (self):
+        """!
+        Stops the timer interrupt sampling, if it's running, and goes back to
+        reading the encoder whenever @c read() is called.
+        """
+        if self._smp_timer is None:
+            return
+        self._smp_timer.callback(None)
+        self._smp_timer.deinit()
+        self._drain(None, None)
+        self._smp_timer = None
+        
+    def _sample (self, tim):
+        """!
+        Timer interrupt callback which reads the counter, corrects for wraps
+        and saves the position and time in the ring buffer. It allocates no
+        memory.
+        @param tim The timer which caused the interrupt
+        """
+        curr_count = self.timer.counter()
+        now = utime.ticks_us()
+        self._isr_pos += count_change(curr_count, self.prev_count)
+        self._isr_time = now
         self.prev_count = curr_count
         
-        return self.curr_pos
+        head = self._smp_head
+        nxt = head + 1
+        if nxt >= self._smp_size:
+            nxt = 0
+        if nxt == self._smp_tail:
+            self._smp_lost += 1
+            return
+        self._smp_pos[head] = self._isr_pos
+        self._smp_time[head] = now
+        self._smp_head = nxt
+        
+    def _drain (self, positions, times):
+        """!
+        Takes the samples out of the ring buffer, updating the state with
+        each one, and optionally copies them into arrays.
+        @param positions An array for the positions, or @c None
+        @param times An array for the times, or @c None
+        @return The number of samples taken out
+        """
+        tail = self._smp_tail
+        head = self._smp_head
+        limit = len(positions) if positions is not None else self._smp_size
+        count = 0
+        while tail != head and count < limit:
+            pos = self._smp_pos[tail] - self._base
+            now = self._smp_time[tail]
+            self._update(pos, now)
+            if positions is not None:
+                positions[count] = pos
+                times[count] = now
+            count += 1
+            tail += 1
+            if tail >= self._smp_size:
+                tail = 0
+        self._smp_tail = tail
+        
+        # If the ring filled up, the samples taken out may be older than the
+        # interrupt's position, which is never behind the encoder. Once the
+        # ring is empty, the interrupt's latest reading is used as one more
+        # sample, with its own time, so the state stays in step; if another
+        # interrupt came while it was being read, that sample is in the ring
+        # and will be taken out next time
+        self.curr_pos = self._isr_pos - self._base
+        if tail == self._smp_head:
+            pos = self.curr_pos
+            now = self._isr_time
+            if tail == self._smp_head and now != self._state[TIME]:
+                self._update(pos, now)
+        return count
+        
+    def get_samples (self, positions, times):
+        """!
+        Takes the samples saved by the timer interrupt out of the ring buffer
+        and copies them, oldest first, into the given arrays.
+        @param positions An array which is filled with positions in ticks
+        @param times An array of the same length which is filled with the
+               times of the samples from @c utime.ticks_us()
+        @return The number of samples copied, which is at most the length of
+                the arrays
+        """
+        return self._drain(positions, times)
+        
+    def lost_samples (self):
+        """!
+        Returns how many samples were lost because the ring buffer was full.
+        """
+        return self._smp_lost if self._smp_timer is not None else 0
     
     def zero (self):
         """!
         Reads the current position of the motor and sets the count to 0 at that 
         current position.
         """
+        if self._smp_timer is not None:
+            self.read()
+            self._base += self.curr_pos
+            for idx in range(self._window):
+                self._win_pos[idx] -= self.curr_pos
+            self._state[POS] = 0
+            self.curr_pos = 0
+            return
         self.prev_count = self.timer.counter()
+        for idx in range(self._window):
+            self._win_pos[idx] -= self.curr_pos
+        self._state[POS] = 0
         self.curr_pos = 0
             
+class EncoderBank:
+    """!
+    This class reads several encoders at the same moment.
+
+    The counters of all of the encoder timers are read one right after
+    another, before any of the counts are processed, so the positions of
+    all axes are taken within a few microseconds of each other rather than
+    up to a task period apart. The positions are kept in an array which is
+    allocated when the bank is made, so reading allocates no memory.
+    
+    @code
+    bank = EncoderBank(((pyb.Pin.board.PC6, pyb.Pin.board.PC7, 8),
+                        (pyb.Pin.board.PB6, pyb.Pin.board.PB7, 4)))
+    positions = bank.read()
+    print(positions[0], positions[1], bank.time)
+    @endcode
+    """
+
+    def __init__ (self, encoders):
+        """!
+        Initializes an EncoderBank object, setting up a timer for each encoder.
+        @param encoders A sequence of (pin1, pin2, timer number) tuples, one
+               for each encoder, as given to @c EncoderReader
+        """
+        self.timers = []
+        self.pins = []
+        for pin1, pin2, tim_num in encoders:
+            pin1, pin2, timer = setup_encoder(pin1, pin2, tim_num)
+            self.timers.append(timer)
+            self.pins.append((pin1, pin2))
+        
+        # The counter methods are looked up once so that the counters are read
+        # as close together as possible
+        self._counters = tuple(timer.counter for timer in self.timers)
+        self._num = len(self.timers)
+        self._counts = array('l', [0] * self._num)
+        self._prev_counts = array('l', [0] * self._num)
+        
+        ## The positions of the encoders in ticks from the latest @c read()
+        self.positions = array('l', [0] * self._num)
+        ## The time of the latest @c read() from @c utime.ticks_us()
+        self.time = utime.ticks_us()
+        
+        self.zero()
+        
+    def __repr__(self):
+        """!
+        Return a string representation of the EncoderBank object.
+        """
+        return f"EncoderBank(timers={self.timers})"
+    
+    def __len__(self):
+        return self._num
+
+    def read (self):
+        """!
+        Reads all of the encoders and returns their positions.
+        @return An array of the positions of the encoders in ticks, in the
+                order they were given. The same array is returned by every
+                call.
+        """
+        counts = self._counts
+        idx = 0
+        self.time = utime.ticks_us()
+        for counter in self._counters:
+            counts[idx] = counter()
+            idx += 1
+        
+        prev = self._prev_counts
+        positions = self.positions
+        for idx in range(self._num):
+            positions[idx] += count_change(counts[idx], prev[idx])
+            prev[idx] = counts[idx]
+        
+        return positions
+    
+    def zero (self, index = None):
+        """!
+        Sets the position of one or all of the encoders to 0 where they are.
+        @param index The index of the encoder to zero, or @c None for all
+        """
+        for idx in range(self._num):
+            if index is None or idx == index:
+                self._prev_counts[idx] = self._counters[idx]()
+                self.positions[idx] = 0
+
+
 if __name__ == "__main__":
     '''
     Test encoder class: Turn the motor by hand and run the motor under power. 
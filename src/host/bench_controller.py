@@ -0,0 +1,85 @@
+"""!
+@file host/bench_controller.py
+This file measures how many updates per second @c CLPController can do with
+floating point and with fixed point gains, and how much memory each update
+allocates. It first checks that fixed point gives the same outputs as
+floating point, within a step of rounding, for several gains including 0.
+Run it from the @c src directory with
+@code
+python host/bench_controller.py
+@endcode
+The memory allocated is found with @c gc.mem_alloc(), which only MicroPython
+has, so run the file with the MicroPython Unix port to see it. CPython makes
+a new object for almost every number, so there the column is left empty.
+"""
+
+import gc
+import os
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being benchmarked are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import clp_controller
+
+
+def bench(controller, runs=200000):
+    """!
+    Run a controller over and over against a changing measurement. The
+    errors are kept small enough that the output never saturates, so every
+    update does the whole control law.
+    @param controller The controller to be tested
+    @param runs The number of updates to do
+    @return A tuple holding the number of updates per second and the number
+            of bytes allocated by each update, or @c None if that can't be
+            measured
+    """
+    measurements = [20000 + error for error in range(-400, 401)]
+    num = len(measurements)
+    counting = hasattr(gc, 'mem_alloc')
+    gc.collect()
+    if counting:
+        gc.disable()
+        before = gc.mem_alloc()
+    start = utime.ticks_us()
+    for run in range(runs):
+        controller.run(20000, measurements[run % num])
+    elapsed = utime.ticks_diff(utime.ticks_us(), start) / 1000000.0
+    per_run = None
+    if counting:
+        per_run = (gc.mem_alloc() - before) / runs
+        gc.enable()
+    return runs / elapsed, per_run
+
+
+def check_fixed(gains=(0, 0.2, -0.2, 0.001, 5)):
+    """!
+    Check that fixed point outputs match floating point ones, rounded toward
+    0 and limited as fixed point does, for errors up to beyond 2^29.
+    @param gains The gains to check
+    """
+    errors = [0, 1, -1, 99, -400, 20000, -20000, 1 << 29, -(1 << 29),
+              (1 << 30) - 1]
+    for kp in gains:
+        controller = clp_controller.CLPController(kp, fixed=True)
+        for error in errors:
+            out = controller.run(error, 0)
+            expected = int(max(-99.0, min(99.0, kp * error)))
+            assert abs(out - expected) <= 1, (kp, error, out, expected)
+            if not kp:
+                assert out == 0, (error, out)
+
+
+if __name__ == "__main__":
+    check_fixed()
+    print("Fixed point outputs match floating point")
+    cases = (('float', clp_controller.CLPController(0.2)),
+             ('fixed', clp_controller.CLPController(0.2, fixed=True)))
+
+    print(f"{'CONTROLLER':<12s}{'UPDATES/s':>12s}{'BYTES/UPDATE':>14s}")
+    for label, controller in cases:
+        rate, per_run = bench(controller)
+        alloc = '-' if per_run is None else f"{per_run:.1f}"
+        print(f"{label:<12s}{rate:12.0f}{alloc:>14s}")
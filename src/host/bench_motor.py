@@ -0,0 +1,79 @@
+"""!
+@file host/bench_motor.py
+This file measures how many calls per second @c MotorDriver can take and
+how many of them write a timer compare register. The driver is run on the
+stand-in @c pyb.Timer, which counts writes to its channels, with the level
+held steady as a settled controller would give, and with the level changing
+on every call. The old way of writing both channels as percents on every
+call is timed too. Run it from the @c src directory with
+@code
+python host/bench_motor.py
+@endcode
+"""
+
+import os
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being benchmarked are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import motor_driver
+
+
+def percent_always(driver, level):
+    """!
+    Set the duty cycle as the driver used to, writing both channels as
+    percents whether or not they change.
+    @param driver The motor driver
+    @param level The duty cycle in percent
+    """
+    if level >= 0:
+        driver.ch1.pulse_width_percent(level)
+        driver.ch2.pulse_width_percent(0)
+    else:
+        driver.ch1.pulse_width_percent(0)
+        driver.ch2.pulse_width_percent(-level)
+
+
+def bench(fun, levels, runs=200000):
+    """!
+    Call a motor driver method with a repeating sequence of levels.
+    @param fun A function which is given a driver and a level
+    @param levels The levels to cycle through
+    @param runs The number of calls to make
+    @return A tuple of calls per second and register writes per call
+    """
+    driver = motor_driver.MotorDriver()
+    num = len(levels)
+    start = utime.ticks_us()
+    for run in range(runs):
+        fun(driver, levels[run % num])
+    elapsed = utime.ticks_diff(utime.ticks_us(), start) / 1000000.0
+    writes = driver.ch1.writes + driver.ch2.writes
+    return runs / elapsed, writes / runs
+
+
+if __name__ == "__main__":
+    steady = (40,)
+    changing = tuple(range(-99, 100, 7))
+    period = motor_driver.MotorDriver().period()
+    steady_ticks = tuple(period * level // 100 for level in steady)
+    changing_ticks = tuple(period * level // 100 for level in changing)
+
+    cases = (('percent, steady', percent_always, steady),
+             ('percent, changing', percent_always, changing),
+             ('duty, steady', motor_driver.MotorDriver.set_duty_cycle,
+              steady),
+             ('duty, changing', motor_driver.MotorDriver.set_duty_cycle,
+              changing),
+             ('compare, steady', motor_driver.MotorDriver.set_compare,
+              steady_ticks),
+             ('compare, changing', motor_driver.MotorDriver.set_compare,
+              changing_ticks))
+
+    print(f"{'CALL':<20s}{'CALLS/s':>12s}{'WRITES/CALL':>13s}")
+    for label, fun, levels in cases:
+        rate, writes = bench(fun, levels)
+        print(f"{label:<20s}{rate:12.0f}{writes:13.2f}")
@@ -0,0 +1,93 @@
+"""!
+@file host/bench_profile.py
+This file measures how much time profiling and tracing add to each run of a
+task by @c cotask.Task.schedule(). A task which does nothing is made ready
+and scheduled over and over with profiling off, on for every run, sampling
+every 16th run, sampling runs at random and with tracing on. It also checks
+that a trace shows the right times after a long run on a virtual clock, past
+the point where the microsecond tick counter wraps around. Run it from the
+@c src directory with
+@code
+python host/bench_profile.py
+@endcode
+"""
+
+import os
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being benchmarked are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import cotask
+
+
+def toggle_fun():
+    """!
+    Task which switches between two states so that traces have data.
+    """
+    state = 0
+    while True:
+        state = 1 - state
+        yield state
+
+
+def bench(profile, trace, runs=200000):
+    """!
+    Time many dispatches of a triggered task through @c schedule().
+    @param profile The task's @c profile parameter
+    @param trace The task's @c trace parameter
+    @param runs The number of times to run the task
+    @return The average time for each dispatch in microseconds
+    """
+    task = cotask.Task(toggle_fun, name="Bench", profile=profile, trace=trace)
+    start = utime.ticks_us()
+    for _ in range(runs):
+        task.go_flag = True
+        task.schedule()
+    return utime.ticks_diff(utime.ticks_us(), start) / runs
+
+
+def check_trace(seconds=1200, trace_size=20):
+    """!
+    Run a traced task once a second on a virtual clock for longer than
+    @c utime.ticks_diff() can measure and check the times in its trace.
+    @param seconds How long to run the task, in simulated seconds
+    @param trace_size The size of the task's trace ring buffer
+    """
+    clock = utime.VirtualClock()
+    utime.use_clock(clock)
+    try:
+        task = cotask.Task(toggle_fun, name="Trace", trace=True,
+                           trace_size=trace_size)
+        for _ in range(seconds):
+            clock.advance(1000000)
+            task.go_flag = True
+            task.schedule()
+    finally:
+        utime.use_clock(None)
+
+    lines = list(task.iter_trace())[1:]
+    assert len(lines) == trace_size - 1, lines
+    for num, line in enumerate(lines):
+        time = float(line.split(':')[0])
+        expected = seconds - len(lines) + 1 + num
+        assert abs(time - expected) < 1e-6, (line, expected)
+
+
+if __name__ == "__main__":
+    check_trace()
+    print("Trace times are right after a long run")
+
+    cases = (('off', False, False),
+             ('full', True, False),
+             ('every 16th', 16, False),
+             ('random 1/16', 1 / 16, False),
+             ('full + trace', True, True))
+
+    base = bench(False, False)
+    print(f"{'PROFILING':<14s}{'us/RUN':>8s}{'OVERHEAD':>10s}")
+    for label, profile, trace in cases:
+        per_run = bench(profile, trace)
+        print(f"{label:<14s}{per_run:8.3f}{(per_run - base):10.3f}")
@@ -0,0 +1,82 @@
+"""!
+@file host/bench_sched.py
+This file benchmarks the schedulers in @c cotask.py on a desktop computer.
+For task lists of several sizes it counts how many scheduler calls can be
+made each second and how many task runs those calls produce, comparing
+@c pri_sched(), @c rr_sched() and @c heap_sched(). Run it from the @c src
+directory with
+@code
+python host/bench_sched.py
+@endcode
+"""
+
+import os
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being benchmarked are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import cotask
+
+
+def idle_fun():
+    """!
+    Task which does nothing at all, so that only scheduling time is measured.
+    """
+    while True:
+        yield 0
+
+
+def make_task_list(num_tasks):
+    """!
+    Create a task list holding the given number of do-nothing tasks. The
+    tasks' periods are spread between 10 ms and 100 ms and they have three
+    different priorities, roughly as in the motor control program.
+    @param num_tasks How many tasks to put in the list
+    @return A new task list holding the tasks
+    """
+    task_list = cotask.TaskList()
+    for num in range(num_tasks):
+        task_list.append(cotask.Task(idle_fun, name=f"Task_{num}",
+                                     priority=num % 3,
+                                     period=10 + (num * 7) % 91))
+    return task_list
+
+
+def bench(task_list, sched_name, duration=1.0):
+    """!
+    Call one of a task list's schedulers repeatedly for a while.
+    @param task_list The task list whose scheduler is to be called
+    @param sched_name The name of the scheduler method, such as @c pri_sched
+    @param duration How many seconds to run the scheduler
+    @return A tuple holding scheduler calls and task runs per second
+    """
+    sched = getattr(task_list, sched_name)
+    tasks = [task for pri in task_list.pri_list for task in pri[2:]]
+    for task in tasks:
+        task._runs = 0
+        task._prof = True
+
+    calls = 0
+    start = utime.ticks_us()
+    stop = int(duration * 1000000)
+    while utime.ticks_diff(utime.ticks_us(), start) < stop:
+        for _ in range(100):
+            sched()
+        calls += 100
+    elapsed = utime.ticks_diff(utime.ticks_us(), start) / 1000000.0
+
+    runs = sum(task._runs for task in tasks)
+    return calls / elapsed, runs / elapsed
+
+
+if __name__ == "__main__":
+    print(f"{'TASKS':>6s}  {'SCHEDULER':<10s}{'CALLS/s':>12s}{'RUNS/s':>10s}"
+          f"{'us/CALL':>9s}")
+    for num_tasks in (3, 30, 300):
+        for sched_name in ('pri_sched', 'rr_sched', 'heap_sched'):
+            calls, runs = bench(make_task_list(num_tasks), sched_name)
+            print(f"{num_tasks:6d}  {sched_name:<10s}{calls:12.0f}"
+                  f"{runs:10.0f}{1000000.0 / calls:9.2f}")
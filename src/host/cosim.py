@@ -0,0 +1,243 @@
+"""!
+@file host/cosim.py
+This file contains a discrete event simulator for task sets scheduled by
+@c cotask.py. The tasks run on a desktop computer against a virtual clock
+which only moves when a task is modelled as using processor time or when the
+scheduler is idle, so many simulated seconds pass in each real second. The
+usual profile tables from @c cotask.TaskList are produced, and a timeline
+of every task run can be exported for Gantt charts.
+
+Run it from the @c src directory with
+@code
+python host/cosim.py
+@endcode
+to simulate a task set like the one in @c main.py.
+"""
+
+import os
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being simulated are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import cotask
+import task_share
+
+
+class Simulator:
+    """!
+    Runs a list of cooperative tasks against a virtual clock.
+
+    Creating a simulator installs its virtual clock as the source of time
+    for @c utime, so the simulator must be created before any of the tasks
+    which it runs. Each task is given a modelled execution time, which the
+    clock is advanced by every time the task runs.
+
+    Example:
+      @code
+          sim = Simulator()
+          sim.task(task_motor_model, exec_time=350, name="Task_1",
+                   priority=1, period=20, profile=True)
+          sim.run(60.0)
+          print(sim.task_list)
+          sim.write_timeline('timeline.csv')
+      @endcode
+    """
+
+    def __init__(self, task_list=None, max_events=100000):
+        """!
+        Create a simulator and start its virtual clock at zero.
+        @param task_list The task list to be run, or @c None to create a new
+               one for this simulator
+        @param max_events The largest number of task runs kept in the
+               timeline; zero turns off the timeline
+        """
+        ## The virtual clock which @c utime reads during the simulation
+        self.clock = utime.VirtualClock()
+        utime.use_clock(self.clock)
+
+        ## The list of tasks being simulated
+        self.task_list = cotask.TaskList() if task_list is None else task_list
+
+        ## A list of (task name, start time, end time, state) tuples, one for
+        #  each run of a task, with times in microseconds
+        self.timeline = []
+        self._max_events = max_events
+
+
+    def task(self, run_fun, exec_time=0, **kwargs):
+        """!
+        Create a task, model its execution time and add it to the task list.
+        @param run_fun The task's generator function, as for @c cotask.Task
+        @param exec_time The time in microseconds for which each run of the
+               task uses the processor, or a function which is given the
+               state yielded by the task and returns that time
+        @param kwargs Other parameters for the @c cotask.Task constructor
+        @return The new task
+        """
+        task = cotask.Task(run_fun, **kwargs)
+        self.add(task, exec_time)
+        return task
+
+
+    def add(self, task, exec_time=0):
+        """!
+        Model the execution time of an existing task and add it to the list.
+        @param task The task, which must have been created after this
+               simulator was created
+        @param exec_time The time in microseconds for which each run of the
+               task uses the processor, or a function which is given the
+               state yielded by the task and returns that time
+        """
+        task._run_gen = self._model(task.name, task._run_gen, exec_time)
+        self.task_list.append(task)
+
+
+    def _model(self, name, run_gen, exec_time):
+        """!
+        Wrap a task's generator so that running it takes virtual time.
+        @param name The name of the task, used in the timeline
+        @param run_gen The task's generator
+        @param exec_time A time in microseconds or a function of the state
+        """
+        clock = self.clock
+        timeline = self.timeline
+        while True:
+            start = clock.now_us
+            state = next(run_gen)
+            if callable(exec_time):
+                clock.advance(exec_time(state))
+            else:
+                clock.advance(exec_time)
+            if len(timeline) < self._max_events:
+                timeline.append((name, start, clock.now_us, state))
+            yield state
+
+
+    def run(self, seconds, sched=None):
+        """!
+        Run the task list for some simulated time.
+        @param seconds The number of simulated seconds to run
+        @param sched The scheduler method to use, by default the task list's
+               @c pri_sched
+        """
+        self.task_list.run_forever(sched, idle=utime.sleep_us,
+                                   max_idle=1000000,
+                                   duration=int(seconds * 1000000))
+
+
+    def close(self):
+        """!
+        Give @c utime back the host's real clock.
+        """
+        utime.use_clock(None)
+
+
+    def write_timeline(self, path):
+        """!
+        Save the timeline to a CSV file with one line per task run, holding
+        the task name, start and end times in microseconds and the state.
+        @param path The name of the file to write
+        """
+        with open(path, 'w') as out:
+            out.write('task,start_us,end_us,state\n')
+            for name, start, end, state in self.timeline:
+                out.write(f'{name},{start},{end},{state}\n')
+
+
+    def gantt(self, start_us=0, end_us=None, width=80):
+        """!
+        Draw part of the timeline as text, with one row for each task and a
+        @c # in each column during which the task was running.
+        @param start_us The simulated time at the left edge, in microseconds
+        @param end_us The simulated time at the right edge, or @c None for
+               100 ms after the left edge
+        @param width The number of columns of the chart
+        @return The chart as a string
+        """
+        if end_us is None:
+            end_us = start_us + 100000
+        col_us = (end_us - start_us) / width
+        names = [task.name for pri in self.task_list.pri_list
+                 for task in pri[2:]]
+        rows = {name: [' '] * width for name in names}
+        for name, start, end, state in self.timeline:
+            if end < start_us or start >= end_us:
+                continue
+            first = max(0, int((start - start_us) / col_us))
+            last = min(width - 1, int((end - start_us) / col_us))
+            for col in range(first, last + 1):
+                rows[name][col] = '#'
+        lines = [f"{'':<16s}|{start_us / 1000.0:<.1f} ms to "
+                 f"{end_us / 1000.0:.1f} ms"]
+        for name in names:
+            lines.append(f"{name:<16s}|{''.join(rows[name])}|")
+        return '\n'.join(lines)
+
+
+def _idle_fun():
+    """!
+    Task model which just yields; its cost is given by its execution time.
+    """
+    while True:
+        yield 0
+
+
+def _motor_model(shares):
+    """!
+    Model of a motor task in @c main.py, which puts its motor's position
+    into the positions share each time it runs.
+    @param shares A tuple of the positions share and the name of the field
+    """
+    positions, name = shares
+    field = positions.field(name)
+    while True:
+        positions.put_field(field, 0)
+        yield 0
+
+
+def _step_response_model():
+    """!
+    Model of the data task in @c main.py, which is woken by every position
+    put by the motor tasks, saves samples for three seconds and then dumps
+    them over the UART in one long run. The motor tasks put 70 positions
+    each second, so a dump comes once in every 210 runs.
+    """
+    runs = 0
+    while True:
+        runs += 1
+        yield 1 if runs % 210 == 0 else 0
+
+
+if __name__ == "__main__":
+    import time
+
+    sim = Simulator()
+    positions = task_share.StructShare('l', ('pos_m1', 'pos_m2'),
+                                       name="Share pos")
+    sim.task(_motor_model, exec_time=400, name="Task_1", priority=1,
+             period=20, profile=True, overrun='skip_missed',
+             shares=(positions, 'pos_m1'))
+    sim.task(_motor_model, exec_time=400, name="Task_2", priority=1,
+             period=50, profile=True, overrun='skip_missed',
+             shares=(positions, 'pos_m2'))
+
+    # As in main.py, the data task has no period and is woken by the share
+    task3 = sim.task(_step_response_model, name="Task_3", priority=2,
+                     exec_time=lambda state: 60000 if state else 800,
+                     profile=True)
+    positions.subscribe(task3)
+
+    sim_seconds = 600.0
+    wall_start = time.perf_counter()
+    sim.run(sim_seconds)
+    wall = time.perf_counter() - wall_start
+    sim.close()
+
+    print(sim.task_list)
+    print(sim.task_list.hist_repr())
+    print(sim.gantt(2950000, 3100000))
+    print(f"\n{sim_seconds:.0f} simulated seconds in {wall:.2f} s")
+    sim.write_timeline('timeline.csv')
@@ -0,0 +1,21 @@
+"""!
+@file host/micropython.py
+This file is a host-side stand-in for the MicroPython @c micropython module.
+The code emitter decorators do nothing on a desktop computer, so they simply
+return the function they are given.
+"""
+
+
+def native(fun):
+    """! Stand-in for @c micropython.native; returns @c fun unchanged. """
+    return fun
+
+
+def viper(fun):
+    """! Stand-in for @c micropython.viper; returns @c fun unchanged. """
+    return fun
+
+
+def const(value):
+    """! Stand-in for @c micropython.const; returns @c value unchanged. """
+    return value
@@ -0,0 +1,206 @@
+"""!
+@file host/pyb.py
+This file is a host-side stand-in for the parts of the MicroPython @c pyb
+module used in this project, so that the modules which use it can be
+imported and benchmarked on a desktop computer. There are no interrupts on
+the host, so disabling them does nothing, and a timer's callback is only run
+when the host program calls @c Timer.fire().
+"""
+
+
+def disable_irq():
+    """!
+    Stand-in for @c pyb.disable_irq().
+    @return The previous interrupt state, which is always @c True here
+    """
+    return True
+
+
+def enable_irq(state=True):
+    """!
+    Stand-in for @c pyb.enable_irq(); does nothing.
+    @param state The interrupt state returned by @c disable_irq()
+    """
+
+
+def wfi():
+    """!
+    Stand-in for @c pyb.wfi(); returns at once.
+    """
+
+
+class _Board:
+    """!
+    Stand-in for @c pyb.Pin.board, on which every pin name is found.
+    """
+
+    def __getattr__(self, name):
+        return name
+
+
+class Pin:
+    """!
+    Stand-in for @c pyb.Pin which remembers the level written to it.
+    """
+    board = _Board()
+    IN = 0
+    OUT_PP = 1
+    OUT_OD = 2
+    PULL_UP = 1
+
+    def __init__(self, pin_id, mode=IN, pull=None):
+        """!
+        Create a stand-in pin.
+        @param pin_id The name of the pin, or another pin
+        @param mode The pin mode, which is ignored
+        @param pull The pull resistor setting, which is ignored
+        """
+        self._name = pin_id._name if isinstance(pin_id, Pin) else pin_id
+        self._value = 0
+
+    def value(self, value=None):
+        """!
+        Read or set the level of the pin.
+        @param value The level to set, or @c None to read it
+        @return The level of the pin if it is being read
+        """
+        if value is None:
+            return self._value
+        self._value = 1 if value else 0
+
+    def high(self):
+        """! Set the pin high. """
+        self._value = 1
+
+    def low(self):
+        """! Set the pin low. """
+        self._value = 0
+
+    def __repr__(self):
+        return f"Pin({self._name})"
+
+
+class TimerChannel:
+    """!
+    Stand-in for a channel of a @c pyb.Timer.
+    """
+
+    def __init__(self, timer, number, mode, pin=None):
+        """!
+        Create a stand-in timer channel.
+        @param timer The timer which owns the channel
+        @param number The channel number
+        @param mode The channel mode, such as @c Timer.PWM
+        @param pin The pin driven or read by the channel
+        """
+        self.timer = timer
+        self.number = number
+        self.mode = mode
+        self.pin = pin
+        self._compare = 0
+        ## Host-only: the number of times the compare value has been written
+        self.writes = 0
+
+    def pulse_width(self, value=None):
+        """!
+        Read or set the compare value of the channel in timer ticks.
+        @param value The value to set, or @c None to read it
+        @return The compare value if it is being read
+        """
+        if value is None:
+            return self._compare
+        self._compare = int(value)
+        self.writes += 1
+
+    def pulse_width_percent(self, value=None):
+        """!
+        Read or set the compare value as a percent of the timer's period, as
+        @c pyb does with floating point scaling.
+        @param value The percent to set, or @c None to read it
+        @return The percent if it is being read
+        """
+        period = self.timer.period() + 1
+        if value is None:
+            return self._compare * 100 / period
+        self._compare = int(value * period / 100)
+        self.writes += 1
+
+
+class Timer:
+    """!
+    Stand-in for @c pyb.Timer.
+
+    The counter only changes when it is set, so a host program can move it as
+    a simulated encoder or clock would. When a frequency is given, the period
+    is found as it would be for an 84 MHz timer clock. The callback is only run when the
+    host program calls @c fire(), as a timer interrupt would.
+    """
+    UP = 0
+    PWM = 1
+    ENC_AB = 2
+
+    def __init__(self, num, freq=None, prescaler=0, period=0xFFFF):
+        """!
+        Create a stand-in timer.
+        @param num The timer number
+        @param freq The frequency of the timer in Hz, if given
+        @param prescaler The prescaler value
+        @param period The largest value of the counter
+        """
+        self.tim_num = num
+        self._freq = freq
+        self._period = 84000000 // freq - 1 if freq else period
+        self._counter = 0
+        self._callback = None
+        self._channels = {}
+
+    def counter(self, value=None):
+        """!
+        Read or set the counter, which wraps at @c period + 1 as on the board.
+        @param value The value to set, or @c None to read it
+        @return The value of the counter if it is being read
+        """
+        if value is None:
+            return self._counter
+        self._counter = value % (self._period + 1)
+
+    def freq(self):
+        """! Return the frequency given when the timer was made. """
+        return self._freq
+
+    def period(self):
+        """! Return the largest value of the counter. """
+        return self._period
+
+    def channel(self, number, mode=None, pin=None):
+        """!
+        Set up or get a channel of the timer.
+        @param number The channel number
+        @param mode The channel mode, or @c None to get an existing channel
+        @param pin The pin driven or read by the channel
+        @return The channel
+        """
+        if mode is not None:
+            self._channels[number] = TimerChannel(self, number, mode, pin)
+        return self._channels[number]
+
+    def callback(self, fun):
+        """!
+        Set the function run at each timer interrupt.
+        @param fun The function, which is given the timer, or @c None
+        """
+        self._callback = fun
+
+    def fire(self):
+        """!
+        Host-only: run the callback as a timer interrupt would.
+        """
+        if self._callback is not None:
+            self._callback(self)
+
+    def deinit(self):
+        """! Stop the timer and remove its callback. """
+        self._callback = None
+
+    def __repr__(self):
+        return f"Timer({self.tim_num})"
@@ -0,0 +1,131 @@
+"""!
+@file host/sim_encoder.py
+This file checks that @c EncoderReader keeps count of a fast motor when its
+16 bit timer counter wraps many times. A simulated motor turns at a steady
+speed while a virtual clock runs; the stand-in encoder timer is set to the
+low 16 bits of the motor's position, and a task reads the encoder every
+period with some random lateness. The position and velocity which the task
+sees are compared with the motor's, both when the task reads the counter
+itself and when a timer interrupt samples it at a fixed rate. The velocity
+and acceleration estimates are also checked against a motor speeding up at
+a constant rate, read at several sampling periods. Run it from the @c src
+directory with
+@code
+python host/sim_encoder.py
+@endcode
+"""
+
+import os
+import random
+import sys
+
+# The stand-ins for MicroPython modules live next to this file; the modules
+# being tested are in the directory above
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import utime
+import encoder_reader
+
+
+def simulate(speed, sampled, seconds=2.0, period_us=20000, late_us=20000,
+             sample_us=1000):
+    """!
+    Run a motor at a steady speed and read it with a late, jittery task.
+    @param speed The speed of the motor in ticks per second
+    @param sampled @c True to sample the encoder in a timer interrupt,
+           @c False to read the counter only when the task runs
+    @param seconds The simulated time to run
+    @param period_us The period of the reading task in microseconds
+    @param late_us The most by which the task may be late, in microseconds
+    @param sample_us The time between timer interrupt samples
+    @return A tuple of the largest position error in ticks, the largest
+            velocity error in percent and the number of samples lost
+    """
+    clock = utime.VirtualClock()
+    utime.use_clock(clock)
+    rand = random.Random(1)
+    enc = encoder_reader.EncoderReader()
+    if sampled:
+        enc.start_sampling(6, 1000000 // sample_us, size=64)
+
+    pos_err = 0
+    vel_err = 0.0
+    next_read = period_us + rand.randrange(late_us)
+    elapsed = 0
+    while elapsed < seconds * 1000000:
+        elapsed += sample_us
+        clock.advance(sample_us)
+        true_pos = speed * elapsed // 1000000
+        enc.timer.counter(true_pos)
+        if sampled:
+            enc._smp_timer.fire()
+        if elapsed >= next_read:
+            state = enc.read_state()
+            pos_err = max(pos_err, abs(state[encoder_reader.POS] - true_pos))
+            if elapsed > 200000:
+                vel = state[encoder_reader.VEL]
+                vel_err = max(vel_err, abs(vel - speed) * 100.0 / speed)
+            next_read += period_us
+            next_read = max(next_read, elapsed) + rand.randrange(late_us)
+
+    lost = enc.lost_samples()
+    enc.stop_sampling()
+    utime.use_clock(None)
+    return pos_err, vel_err, lost
+
+
+def check_acceleration(accel, sample_us, seconds=0.5, window=4):
+    """!
+    Speed a motor up at a constant rate from rest, read the encoder every
+    sampling period and check the average velocity and acceleration errors.
+    Single readings are noisy because positions are whole ticks, but the
+    errors of the estimates should average out to almost nothing.
+    @param accel The acceleration of the motor in ticks per second squared
+    @param sample_us The time between readings in microseconds
+    @param seconds The simulated time to run
+    @param window The velocity window of the encoder reader
+    @return A tuple of the average velocity and acceleration errors in
+            percent
+    """
+    clock = utime.VirtualClock()
+    utime.use_clock(clock)
+    enc = encoder_reader.EncoderReader(window=window, accel=True)
+
+    vel_sum = 0
+    acc_sum = 0
+    vel_err = 0
+    acc_err = 0
+    elapsed = 0
+    while elapsed < seconds * 1000000:
+        elapsed += sample_us
+        clock.advance(sample_us)
+        enc.timer.counter(accel * elapsed * elapsed // 2000000000000)
+        state = enc.read_state()
+        if elapsed > 2 * window * sample_us:
+            # The velocity is the average over the window, which is the
+            # speed at the window's centre
+            speed = accel * (elapsed - window * sample_us / 2) / 1000000
+            vel_sum += speed
+            vel_err += state[encoder_reader.VEL] - speed
+            acc_sum += accel
+            acc_err += state[encoder_reader.ACC] - accel
+
+    utime.use_clock(None)
+    return vel_err * 100.0 / vel_sum, acc_err * 100.0 / acc_sum
+
+
+if __name__ == "__main__":
+    for sample_us in (100, 250, 1000, 5000):
+        vel_err, acc_err = check_acceleration(2000000, sample_us)
+        assert abs(vel_err) < 0.5 and abs(acc_err) < 1.0, \
+            (sample_us, vel_err, acc_err)
+    print("Velocity and acceleration are right at 100 us to 5 ms sampling")
+
+    print(f"{'TICKS/s':>10s}{'MODE':>9s}{'POS ERR':>10s}{'VEL ERR %':>11s}"
+          f"{'LOST':>6s}")
+    for speed in (10000, 200000, 600000, 1000000, 3000000):
+        for sampled in (False, True):
+            pos_err, vel_err, lost = simulate(speed, sampled)
+            mode = 'timer' if sampled else 'task'
+            print(f"{speed:10d}{mode:>9s}{pos_err:10d}{vel_err:11.2f}"
+                  f"{lost:6d}")
@@ -0,0 +1,154 @@
+r"""!
+@file host/sweep.py
+This file simulates the closed loop position control done by @c main.py for
+a whole grid of controller gains, task periods and motor parameters at once.
+Every combination is one element of a set of NumPy arrays, so each time step
+of the simulation updates all of them together and a sweep of hundreds of
+configurations takes well under a second.
+
+The motor is modelled as a first order system from duty cycle to speed,
+@f$ \tau \dot\omega = K u - \omega @f$, whose position is read by an encoder
+with whole ticks. The controller is the proportional law of
+@c CLPController, with its output held between runs of the task and limited
+to +/-99 as @c MotorDriver.set_duty_cycle() does. Run it from the @c src
+directory with
+@code
+python host/sweep.py
+@endcode
+to print tables like those which the plots in the README were made to find.
+NumPy is needed on the host only; nothing here runs on the board.
+"""
+
+import numpy as np
+
+
+## The default motor gain, in encoder ticks per second per percent duty cycle
+DEFAULT_GAIN = 1500.0
+
+## The default motor time constant in seconds
+DEFAULT_TAU = 0.05
+
+
+def simulate(kp, period, gain=DEFAULT_GAIN, tau=DEFAULT_TAU, setpoint=20000,
+             duration=3.0, dt=0.001, limit=99, band=0.02, record=False):
+    """!
+    Simulate a step response for every combination of the parameters.
+
+    The parameters @c kp, @c period, @c gain and @c tau may be numbers or
+    arrays; they are broadcast together in the NumPy way and each element of
+    the result is one closed loop system. Use @c grid() to make arrays with
+    one dimension for each parameter.
+    @param kp The proportional gain, in percent duty cycle per tick
+    @param period The period of the control task in seconds, which is
+           rounded to a whole number of simulation steps
+    @param gain The motor gain in ticks per second per percent duty cycle
+    @param tau The motor time constant in seconds
+    @param setpoint The step in position, in encoder ticks
+    @param duration The length of the simulation in seconds
+    @param dt The simulation time step in seconds
+    @param limit The largest magnitude of the duty cycle
+    @param band The settling band, as a fraction of the setpoint
+    @param record @c True to also return the time and position histories
+    @return A dictionary of arrays with the shape of the broadcast
+            parameters: @c settling, the time in seconds after which the
+            position stays within the band (@c inf if it never does);
+            @c overshoot, in percent of the setpoint; and @c sse, the mean
+            magnitude of the error over the last tenth of the run in ticks.
+            If @c record is set, @c time and @c position (with time as the
+            first dimension) are included as well.
+    """
+    kp, period, gain, tau = np.broadcast_arrays(
+        *(np.asarray(p, dtype=float) for p in (kp, period, gain, tau)))
+    shape = kp.shape
+    steps = int(round(duration / dt))
+    every = np.maximum(1, np.rint(period / dt)).astype(np.int64)
+
+    # The exact discrete form of the motor over one step with constant duty
+    decay = np.exp(-dt / tau)
+    carry = tau * (1.0 - decay)
+
+    pos = np.zeros(shape)
+    vel = np.zeros(shape)
+    duty = np.zeros(shape)
+    peak = np.zeros(shape)
+    last_out = np.zeros(shape)
+    err_sum = np.zeros(shape)
+    tail = steps - steps // 10
+    history = np.empty((steps,) + shape) if record else None
+    tol = abs(setpoint) * band
+
+    for n in range(steps):
+        update = (n % every) == 0
+        if update.any():
+            error = setpoint - np.floor(pos)
+            duty = np.where(update, np.clip(kp * error, -limit, limit), duty)
+        speed = gain * duty
+        pos = pos + speed * dt + (vel - speed) * carry
+        vel = speed + (vel - speed) * decay
+        np.maximum(peak, pos, out=peak)
+        error = np.abs(setpoint - pos)
+        last_out = np.where(error > tol, (n + 1) * dt, last_out)
+        if n >= tail:
+            err_sum += error
+        if record:
+            history[n] = pos
+
+    settled = np.abs(setpoint - pos) <= tol
+    result = {
+        'settling': np.where(settled, last_out, np.inf),
+        'overshoot': np.maximum(0.0, (peak - setpoint) / setpoint * 100.0),
+        'sse': err_sum / (steps - tail),
+    }
+    if record:
+        result['time'] = np.arange(1, steps + 1) * dt
+        result['position'] = history
+    return result
+
+
+def grid(*axes):
+    """!
+    Make arrays which, when broadcast together, hold every combination of
+    values along the given axes.
+    @param axes Sequences of parameter values, one for each dimension
+    @return A list of arrays, one for each axis, shaped for broadcasting
+    """
+    return np.meshgrid(*(np.asarray(a, dtype=float) for a in axes),
+                       indexing='ij', sparse=True)
+
+
+def format_table(values, rows, cols, row_label, col_label, fmt='{:8.3f}'):
+    """!
+    Put a two dimensional result into a text table.
+    @param values The 2-D array of results
+    @param rows The parameter values down the side of the table
+    @param cols The parameter values across the top of the table
+    @param row_label The name of the row parameter
+    @param col_label The name of the column parameter
+    @param fmt The format of each value, 8 characters wide
+    @return The table as a string
+    """
+    corner = row_label + ' \\ ' + col_label
+    lines = [f"{corner:<12s}" + ''.join(f"{c:>8g}" for c in cols)]
+    for r, row in zip(rows, values):
+        lines.append(f"{r:<12g}" + ''.join(fmt.format(v) for v in row))
+    return '\n'.join(lines)
+
+
+if __name__ == "__main__":
+    import time
+
+    kps = [0.005, 0.01, 0.02, 0.05, 0.1, 0.2]
+    periods = [0.010, 0.020, 0.050]
+    kp, period = grid(kps, periods)
+
+    wall_start = time.perf_counter()
+    result = simulate(kp, period)
+    wall = time.perf_counter() - wall_start
+
+    period_ms = [p * 1000 for p in periods]
+    for key, title, fmt in (('settling', 'Settling time, s', '{:8.3f}'),
+                            ('overshoot', 'Overshoot, %', '{:8.1f}'),
+                            ('sse', 'Steady state error, ticks', '{:8.1f}')):
+        print(f"\n{title}")
+        print(format_table(result[key], kps, period_ms, 'Kp', 'ms', fmt))
+    print(f"\n{kp.size * period.size} configurations in {wall:.2f} s")
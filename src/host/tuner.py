@@ -0,0 +1,227 @@
+"""!
+@file host/tuner.py
+This file finds controller settings from a step response recorded on the
+board. The response is the @c time,position data which @c task_step_response
+in @c main.py writes to the serial port, saved to a file or read straight
+from the port as @c serial_test.plotter() does. The fit assumes a step in
+the setpoint, so record the response with @c USE_PROFILES set to @c False in
+@c main.py; a response to a motion profile would give a wrong model.
+
+The motor model of @c sweep.py, a first order lag from duty cycle to speed
+followed by an integrator to position, is fitted to the response by
+simulating the closed loop which made it for a grid of motor gains and time
+constants at once, then for a finer grid around the best fit. The fitted
+model is then swept over controller gains and task periods to find the
+longest period, and so the least processor time, at which the settling spec
+can still be met. Run it from the @c src directory with
+@code
+python host/tuner.py response.csv --kp 0.2 --period 20 --setpoint 20000
+@endcode
+or give @c --port instead of a file name to read the response from the
+board. NumPy is needed on the host only.
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+# The sweep engine lives next to this file
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import sweep
+
+
+def parse_lines(lines):
+    """!
+    Get the times and positions from lines of @c time,position data.
+
+    Lines which don't start with two numbers, such as the @c Done! written
+    after the data, are skipped.
+    @param lines An iterable of lines as strings or bytes; times are in
+           milliseconds and positions in encoder ticks
+    @return A tuple of arrays of times in seconds and positions in ticks
+    """
+    times = []
+    positions = []
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode(errors='replace')
+        fields = line.strip().split(',')
+        try:
+            time, position = float(fields[0]), float(fields[1])
+        except (ValueError, IndexError):
+            continue
+        times.append(time / 1000.0)
+        positions.append(position)
+    return np.array(times), np.array(positions)
+
+
+def load(path):
+    """!
+    Read a step response from a file.
+    @param path The name of the file holding @c time,position lines
+    @return A tuple of arrays of times in seconds and positions in ticks
+    """
+    with open(path) as data:
+        return parse_lines(data)
+
+
+def read_serial(port, baudrate=115200, timeout=10):
+    """!
+    Read a step response from the board as it is sent, stopping at the line
+    @c Done! or when no data comes for @c timeout seconds.
+    @param port The name of the serial port, such as @c COM4
+    @param baudrate The baud rate of the port
+    @param timeout The longest time to wait for a line, in seconds
+    @return A tuple of arrays of times in seconds and positions in ticks
+    """
+    import serial
+
+    lines = []
+    with serial.Serial(port, baudrate, timeout=timeout) as ser:
+        while True:
+            line = ser.readline()
+            if not line or line.startswith(b'Done'):
+                break
+            lines.append(line)
+    return parse_lines(lines)
+
+
+def _fit_error(times, positions, kp, period, gain, tau, setpoint, dt):
+    """!
+    Simulate the closed loop for a grid of motor models and measure how far
+    each one is from the recorded response.
+    @return The RMS difference in ticks for each model in the grid
+    """
+    duration = times[-1] + dt
+    result = sweep.simulate(kp, period, gain, tau, setpoint=setpoint,
+                            duration=duration, dt=dt, record=True)
+    index = np.clip(np.rint(times / dt).astype(int) - 1, 0,
+                    result['position'].shape[0] - 1)
+    sim = result['position'][index]
+    diff = sim - positions.reshape((-1,) + (1,) * (sim.ndim - 1))
+    return np.sqrt(np.mean(diff * diff, axis=0))
+
+
+def fit_motor(times, positions, kp, period, setpoint, gains=None, taus=None,
+              dt=0.001, refine=2):
+    """!
+    Fit the motor model to a recorded closed loop step response.
+    @param times The times of the samples in seconds
+    @param positions The positions of the motor in ticks
+    @param kp The controller gain used for the recording
+    @param period The period of the motor task in seconds
+    @param setpoint The setpoint used for the recording, in ticks
+    @param gains The motor gains to try first, in ticks per second per
+           percent duty cycle, or @c None for a wide range
+    @param taus The time constants to try first in seconds, or @c None for a
+           wide range
+    @param dt The simulation time step in seconds
+    @param refine How many times to search a finer grid around the best fit
+    @return A tuple of the motor gain, the time constant and the RMS
+            difference in ticks between the model and the recording
+    """
+    if gains is None:
+        gains = np.geomspace(100.0, 20000.0, 40)
+    if taus is None:
+        taus = np.geomspace(0.005, 1.0, 40)
+    gains = np.asarray(gains, dtype=float)
+    taus = np.asarray(taus, dtype=float)
+
+    for _ in range(refine + 1):
+        gain, tau = sweep.grid(gains, taus)
+        rms = _fit_error(times, positions, kp, period, gain, tau, setpoint,
+                         dt)
+        i, j = np.unravel_index(np.argmin(rms), rms.shape)
+        best = gains[i], taus[j], rms[i, j]
+
+        # Search between the neighbours of the best fit in each direction
+        gains = np.geomspace(gains[max(i - 1, 0)],
+                             gains[min(i + 1, len(gains) - 1)], 21)
+        taus = np.geomspace(taus[max(j - 1, 0)],
+                            taus[min(j + 1, len(taus) - 1)], 21)
+    return best
+
+
+def recommend(gain, tau, settle, overshoot=10.0, setpoint=20000, kps=None,
+              periods=None):
+    """!
+    Find the longest task period and a gain which meet a settling spec.
+    @param gain The motor gain in ticks per second per percent duty cycle
+    @param tau The motor time constant in seconds
+    @param settle The longest allowed settling time in seconds
+    @param overshoot The largest allowed overshoot in percent
+    @param setpoint The size of the step in ticks
+    @param kps The controller gains to try, or @c None for a wide range
+    @param periods The task periods to try in seconds, or @c None for 5 ms to
+           200 ms in steps of 5 ms
+    @return A tuple of the period in seconds, the gain and the settling time
+            of the best setting, or @c None if no setting meets the spec
+    """
+    if kps is None:
+        kps = np.geomspace(0.0005, 0.5, 61)
+    if periods is None:
+        periods = np.arange(0.005, 0.2001, 0.005)
+    kps = np.asarray(kps, dtype=float)
+    periods = np.asarray(periods, dtype=float)
+
+    kp, period = sweep.grid(kps, periods)
+    result = sweep.simulate(kp, period, gain, tau, setpoint=setpoint,
+                            duration=max(3.0, 2.0 * settle))
+    settling = result['settling']
+    good = (settling <= settle) & (result['overshoot'] <= overshoot)
+    usable = np.nonzero(good.any(axis=0))[0]
+    if not len(usable):
+        return None
+
+    # Of the gains which work at the longest usable period, take the one
+    # which settles soonest
+    j = usable[-1]
+    times = np.where(good[:, j], settling[:, j], np.inf)
+    i = np.argmin(times)
+    return periods[j], kps[i], settling[i, j]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Fit a motor model to a recorded step response and "
+                    "recommend a controller gain and task period.")
+    parser.add_argument('file', nargs='?',
+                        help="file of time,position lines from the board")
+    parser.add_argument('--port', help="serial port to read the data from")
+    parser.add_argument('--kp', type=float, default=0.2,
+                        help="controller gain used for the recording")
+    parser.add_argument('--period', type=float, default=20.0,
+                        help="motor task period used for the recording, ms")
+    parser.add_argument('--setpoint', type=float, default=20000.0,
+                        help="setpoint used for the recording, ticks")
+    parser.add_argument('--settle', type=float, default=1.0,
+                        help="longest allowed settling time, s")
+    parser.add_argument('--overshoot', type=float, default=10.0,
+                        help="largest allowed overshoot, percent")
+    args = parser.parse_args()
+
+    if args.port:
+        times, positions = read_serial(args.port)
+    elif args.file:
+        times, positions = load(args.file)
+    else:
+        parser.error("give a data file or --port")
+    if len(times) < 2:
+        sys.exit("Not enough data in the step response")
+
+    gain, tau, rms = fit_motor(times, positions, args.kp,
+                               args.period / 1000.0, args.setpoint)
+    print(f"Motor gain {gain:.0f} ticks/s per % duty, time constant "
+          f"{tau * 1000.0:.1f} ms (RMS error {rms:.0f} ticks)")
+
+    best = recommend(gain, tau, args.settle, args.overshoot, args.setpoint)
+    if best is None:
+        print(f"No gain and period settle within {args.settle} s with less "
+              f"than {args.overshoot}% overshoot")
+    else:
+        period, kp, settling = best
+        print(f"Use a period of {period * 1000.0:.0f} ms with Kp = {kp:.4g}, "
+              f"settling in {settling:.3f} s")
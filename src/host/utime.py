@@ -0,0 +1,115 @@
+"""!
+@file host/utime.py
+This file is a host-side stand-in for the MicroPython @c utime module. It lets
+@c cotask.py and the other modules in this project be imported and benchmarked
+on a desktop computer running ordinary Python.
+
+The tick counters wrap around at @c TICKS_PERIOD just as they do on the
+board, so code which forgets to use @c ticks_diff() misbehaves here as well.
+By default the ticks follow the computer's monotonic clock; a virtual clock
+can be installed with @c use_clock() to run tests at simulated time.
+"""
+
+import time
+
+## Tick counters wrap around at this value, as on the MicroPython port
+TICKS_PERIOD = 1 << 30
+_TICKS_MAX = TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = TICKS_PERIOD // 2
+
+# The clock in use, or @c None to use the host's monotonic clock
+_clock = None
+
+
+class VirtualClock:
+    """!
+    A clock whose time only changes when it is told to.
+
+    While a virtual clock is installed with @c use_clock(), @c ticks_us() and
+    friends read its time, and @c sleep_us() and @c sleep_ms() advance it
+    instead of waiting.
+    """
+
+    def __init__(self, start_us=0):
+        """!
+        Create a virtual clock.
+        @param start_us The time in microseconds at which the clock starts
+        """
+        ## The current virtual time in microseconds; it never wraps around
+        self.now_us = int(start_us)
+
+    def advance(self, us):
+        """!
+        Move the clock forward by the given number of microseconds.
+        @param us The number of microseconds by which to advance the clock
+        """
+        self.now_us += int(us)
+
+    def __call__(self):
+        return self.now_us
+
+
+def use_clock(clock):
+    """!
+    Select the clock which drives the tick functions.
+    @param clock A @c VirtualClock or any callable which returns the time in
+           microseconds, or @c None to go back to the host's real clock
+    """
+    global _clock
+    _clock = clock
+
+
+def _now_us():
+    if _clock is None:
+        return time.perf_counter_ns() // 1000
+    return _clock()
+
+
+def ticks_us():
+    """!
+    @return The time in microseconds, wrapped at @c TICKS_PERIOD
+    """
+    return _now_us() & _TICKS_MAX
+
+
+def ticks_ms():
+    """!
+    @return The time in milliseconds, wrapped at @c TICKS_PERIOD
+    """
+    return (_now_us() // 1000) & _TICKS_MAX
+
+
+def ticks_add(ticks, delta):
+    """!
+    @return The tick value @c delta ticks after @c ticks, wrapped correctly
+    """
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    """!
+    @return The signed number of ticks from @c ticks2 to @c ticks1
+    """
+    return ((ticks1 - ticks2 + _TICKS_HALFPERIOD) & _TICKS_MAX) \
+        - _TICKS_HALFPERIOD
+
+
+def sleep_us(us):
+    """!
+    Wait for the given number of microseconds, or advance a virtual clock.
+    @param us The number of microseconds to wait
+    """
+    if us <= 0:
+        return
+    if isinstance(_clock, VirtualClock):
+        _clock.advance(us)
+    else:
+        time.sleep(us / 1000000.0)
+
+
+def sleep_ms(ms):
+    """!
+    Wait for the given number of milliseconds, or advance a virtual clock.
+    @param ms The number of milliseconds to wait
+    """
+    sleep_us(ms * 1000)
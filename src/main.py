@@ -17,16 +17,22 @@ import task_share
 import motor_driver
 import encoder_reader
 import clp_controller
+import trajectory
 import utime
 import array
 
+## Set this to @c False to step the setpoints straight to their targets
+#  instead of following motion profiles. Step responses recorded this way are
+#  what @c host/tuner.py fits its motor model to.
+USE_PROFILES = True
+
 
 def task_motor1(shares):
     """!
     This task creates the motor one objects, sets its proportional control gain,
     and updates its position based on encoder readings.
-    @param shares A list holding the shares used by this task, the setpoint and 
-    position of motor one.
+    @param shares A list holding the shares used by this task, the setpoint of
+    motor one and the positions of both motors.
     """
     # Create motor1 objects.
     motor_dvr1 = motor_driver.MotorDriver()
@@ -37,7 +43,8 @@ def task_motor1(shares):
     controller1.set_Kp(.2) # IMPORTANT: set this to around .01
     
     # Get references to the share and queue which have been passed to this task.
-    setpoint_m1, position_m1 = shares
+    setpoint_m1, positions = shares
+    pos_field = positions.field('pos_m1')
     
     while True:
         new_setpoint = setpoint_m1.get()
@@ -45,9 +52,7 @@ def task_motor1(shares):
         motor_dvr1.set_duty_cycle(
             controller1.run(new_setpoint, encoder1.read())
             )
-        position_m1.put(
-            controller1.motor_positions[len(controller1.motor_positions)-1]
-            )
+        positions.put_field(pos_field, controller1.latest_output)
         yield 0
 
 
@@ -55,8 +60,8 @@ def task_motor2(shares):
     """!
     This task creates the motor two objects, sets its proportional control gain,
     and updates its position based on encoder readings.
-    @param shares A list holding the shares used by this task, the setpoint and 
-    position of motor one.
+    @param shares A list holding the shares used by this task, the setpoint of
+    motor two and the positions of both motors.
     """
     # Create motor2 objects.
     motor_dvr2 = motor_driver.MotorDriver(
@@ -71,7 +76,8 @@ def task_motor2(shares):
     controller2.set_Kp(0.02)
     
     # Get references to the share and queue which have been passed to this task.
-    setpoint_m2, position_m2 = shares
+    setpoint_m2, positions = shares
+    pos_field = positions.field('pos_m2')
 
     while True:
         new_setpoint = setpoint_m2.get()
@@ -79,18 +85,18 @@ def task_motor2(shares):
         motor_dvr2.set_duty_cycle(
             controller2.run(new_setpoint, encoder2.read())
             )
-        position_m2.put(
-            controller2.motor_positions[len(controller2.motor_positions)-1]
+        positions.put_field(pos_field, controller2.latest_output
             ) # encoder starting to read now when changing the position
         yield 0
 
 def task_step_response(shares):
     """!
     This task writes the position data of both motors to the serial port.
-    @param shares A list holding the shares used by this task, the setpoints and 
-    positions of motors one and two.
+    @param shares A list holding the shares used by this task, the setpoints of
+    motors one and two and the positions of both motors.
     """
-    setpoint_m1, position_m1, setpoint_m2, position_m2 = shares
+    setpoint_m1, setpoint_m2, positions = shares
+    snapshot = array.array('l', [0, 0])
     
     u2 = pyb.UART(2, baudrate=115200)
     start_time = utime.ticks_ms()
@@ -106,14 +112,15 @@ def task_step_response(shares):
         if time < 3000:
             
             time = utime.ticks_ms() - start_time
-            curr_pos_m1 = position_m1.get()
-            curr_pos_m2 = position_m2.get()
+            positions.get_into(snapshot)
+            curr_pos_m1 = snapshot[0]
+            curr_pos_m2 = snapshot[1]
 
             data.append(array.array('i',[time, curr_pos_m1, curr_pos_m2]))
             print([time, curr_pos_m1, curr_pos_m2])
-            yield 0
             
-        if time>= 3000:
+        # Only one yield in each pass, since every wakeup is a new sample
+        else:
             for i in data:
                 u2.write(f'{i[0]},{i[1]}\r\n')
             u2.write(b"Done!\r\n")
@@ -126,39 +133,65 @@ if __name__ == "__main__":
     share_m1_setpoint = task_share.Share(
         'l', thread_protect=False, name="Share m1 setpt"
         )
-    share_m1_position = task_share.Share(
-        'l', thread_protect=False, name="Share m1 pos"
-        )
     share_m2_setpoint = task_share.Share(
         'l', thread_protect=False, name="Share m2 setpt"
         )
-    share_m2_position = task_share.Share(
-        'l', thread_protect=False, name="Share m2 pos")
+    share_positions = task_share.StructShare(
+        'l', ('pos_m1', 'pos_m2'), name="Share pos")
+    
+    # Unless recording a step response, move the setpoints smoothly to their
+    # targets rather than stepping them
+    if USE_PROFILES:
+        share_m1_setpoint.put(0)
+        share_m2_setpoint.put(0)
+    else:
+        share_m1_setpoint.put(20000)
+        share_m2_setpoint.put(10000)
+    profile_m1 = trajectory.Profile(
+        0, 20000, v_max=30000, a_max=100000, period=20, shape='s_curve'
+        )
+    profile_m2 = trajectory.Profile(
+        0, 10000, v_max=30000, a_max=100000, period=20, shape='s_curve'
+        )
     
-    share_m1_setpoint.put(20000)
-    share_m2_setpoint.put(10000)
+    # Create the tasks. The trajectory task has the highest priority so
+    # that the motor tasks always see the newest setpoints
+    task0 = cotask.Task(
+        trajectory.task_trajectory, name="Task_0", priority=3, period=20,
+        profile=True, overrun='skip_missed',
+        shares=(
+            (profile_m1, share_m1_setpoint), (profile_m2, share_m2_setpoint)
+            )
+        )
     
-    # Create the tasks.
     task1 = cotask.Task(
         task_motor1, name="Task_1", priority=1, period=20, #change the period here
-        profile=True, trace=True, shares=(
-            share_m1_setpoint, share_m1_position
+        profile=True, trace=True, overrun='skip_missed',
+        shares=(
+            share_m1_setpoint, share_positions
             )
         )
     task2 = cotask.Task(
         task_motor2, name="Task_2", priority=1, period=50,
-        profile=True, trace=True, shares=(
-            share_m2_setpoint, share_m2_position
+        profile=True, trace=True, overrun='skip_missed',
+        shares=(
+            share_m2_setpoint, share_positions
             )
         )
     task3 = cotask.Task(
-        task_step_response, name="Task_3", priority=2, period=10,
-        profile=True, trace=True, shares=(
-            share_m1_setpoint, share_m1_position, 
-            share_m2_setpoint, share_m2_position
+        task_step_response, name="Task_3", priority=2,
+        profile=True, trace=True,
+        shares=(
+            share_m1_setpoint, share_m2_setpoint, share_positions
             )
         )
     
+    # The data task has no period; it runs whenever either motor's position
+    # has been updated, so each new sample is recorded once
+    share_positions.subscribe(task3)
+
+    if USE_PROFILES:
+        cotask.task_list.append(task0)
     cotask.task_list.append(task1)
     cotask.task_list.append(task2)
     cotask.task_list.append(task3)
@@ -166,9 +199,10 @@ if __name__ == "__main__":
     # Run the memory garbage collector.
     gc.collect()
 
-    # Run the scheduler with the chosen scheduling algorithm. Quit if ^C pressed
-    while True:
-        try:
-            cotask.task_list.pri_sched()
-        except KeyboardInterrupt:
-            break
+    # Run the scheduler with the chosen scheduling algorithm, waiting for the
+    # next interrupt whenever no task is ready. Quit if ^C pressed
+    try:
+        cotask.task_list.run_forever(cotask.task_list.pri_sched,
+                                     idle=lambda us: pyb.wfi())
+    except KeyboardInterrupt:
+        pass
@@ -3,15 +3,25 @@
    test in the file main to make sure it works properly.
 """
 import pyb
+import utime
 
 class MotorDriver:
     """! 
     This class implements a motor driver for an ME405 kit. 
+
+    The duty cycle given to @c set_duty_cycle() can be shaped before it is
+    sent to the motor; see @c set_shaping(). Small commands can be dropped
+    (deadband), the rest remapped to start at the smallest duty cycle which
+    turns the motor, and the rate of change of the output limited so that a
+    step command doesn't cause a current spike. All of this is done with
+    integers in timer ticks.
     """
 
     def __init__ (
                   self, en_pin = pyb.Pin.board.PA10, in1pin = pyb.Pin.board.PB4, 
-                  in2pin = pyb.Pin.board.PB5, tim_num: int = 3
+                  in2pin = pyb.Pin.board.PB5, tim_num: int = 3,
+                  slew_rate: int = 0, deadband: int = 0, min_duty: int = 0,
+                  period_ms: int = 20
                   ):
         """! 
         Initializes selected pins and timer appropriately. Turns the motor off 
@@ -23,6 +33,9 @@ class MotorDriver:
                PWM signal (with in1pin set low) to power the motor CCW (?).
         @param timer Motor driver timer which generates PWM signals whose 
                frequency determines the motor speed.
+        @param slew_rate, deadband, min_duty, period_ms Output shaping
+               settings, as for @c set_shaping(); by default there is no
+               shaping.
         """
         self.en_pin = pyb.Pin(en_pin, pyb.Pin.OUT_OD, pull=pyb.Pin.PULL_UP) #consider changing to an output with push pull from open drain
         self.in1pin = pyb.Pin(in1pin, pyb.Pin.OUT_PP)
@@ -32,6 +45,23 @@ class MotorDriver:
         self.ch1 = self.timer.channel(1, pyb.Timer.PWM, pin=self.in1pin) 
         self.ch2 = self.timer.channel(2, pyb.Timer.PWM, pin=self.in2pin)
         
+        # Compare values are written in timer ticks; one percent of duty cycle
+        # is a hundredth of the number of ticks in a period
+        self._period = self.timer.period() + 1
+        
+        # The compare values last written to each channel, so that writes
+        # which wouldn't change anything can be skipped
+        self._ch1_ticks = -1
+        self._ch2_ticks = -1
+        
+        # The signed compare value last applied, from which the slew rate
+        # limit is measured, the time at which it was applied, and the part
+        # of a tick of slew left over from earlier calls, in thousandths
+        self._ticks = 0
+        self._last_ms = utime.ticks_ms()
+        self._slew_left = 0
+        self.set_shaping(slew_rate, deadband, min_duty, period_ms)
+        
         # Turn the motor off for safety
         self.en_pin.low()
         
@@ -53,23 +83,129 @@ class MotorDriver:
         
         #self.en_pin.high() #enable motor
         
-        # set the timer according to the specified PWM duty cycle 'level'
+        # set the timer according to the specified PWM duty cycle 'level',
+        # converted to timer ticks with integer math when level is an integer
         if level >= 99:
             level = 99
-        if level >= 0:
-            self.ch1.pulse_width_percent(abs(level)) #IN1A low
-            self.ch2.pulse_width_percent(0) #PWM signal to IN2A
-        elif level < 0:
-            self.ch1.pulse_width_percent(0) #IN1A low
-            self.ch2.pulse_width_percent(abs(level)) #PWM signal to IN2A
+        elif level <= -99:
+            level = -99
+        ticks = int(level * self._period) // 100
+        if self._shaping:
+            ticks = self._shape(ticks)
+        self.set_compare(ticks)
         
         #print (f"Setting duty cycle to {level}")
+    
+    def set_shaping(self, slew_rate = 0, deadband = 0, min_duty = 0,
+                    period_ms = 20):
+        """!
+        This method sets how the duty cycle given to @c set_duty_cycle() is
+        shaped. Each setting of 0 turns that part of the shaping off.
+        @param slew_rate The fastest the duty cycle may change, in percent per
+               second. For example, 500 takes 0.2 seconds to go from 0 to 99.
+        @param deadband Duty cycles whose size is this many percent or less
+               are sent as 0
+        @param min_duty The smallest duty cycle in percent which makes the
+               motor turn. The levels above the deadband are remapped
+               linearly so that they start here and still end at 99.
+        @param period_ms The period in milliseconds of the task which calls
+               @c set_duty_cycle(). A longer gap between calls, such as
+               before the first call or after the motor has been disabled,
+               only lets the output change as much as one period would.
+        """
+        period = self._period
+        self._slew = slew_rate * period // 100
+        self._dead = deadband * period // 100
+        self._min = min_duty * period // 100
+        self._full = 99 * period // 100
+        self._span = self._full - self._dead
+        self._slew_ms = period_ms
+        self._shaping = bool(slew_rate or deadband or min_duty)
+        self._last_ms = utime.ticks_ms()
+        self._slew_left = 0
+    
+    def _shape(self, ticks):
+        """!
+        Applies the deadband, minimum duty cycle and slew rate limit to a
+        compare value.
+        @param ticks The signed compare value wanted
+        @return The signed compare value to apply now
+        """
+        size = ticks if ticks >= 0 else -ticks
+        if size <= self._dead:
+            size = 0
+        elif self._min:
+            size = (self._min
+                    + (size - self._dead) * (self._full - self._min)
+                    // self._span)
+        ticks = size if ticks >= 0 else -size
+        
+        if self._slew:
+            now = utime.ticks_ms()
+            elapsed = utime.ticks_diff(now, self._last_ms)
+            self._last_ms = now
+            if elapsed > self._slew_ms:
+                elapsed = self._slew_ms
+            
+            # The allowed change is kept in thousandths of a tick, and what
+            # a step leaves over is carried to the next call, so slow rates
+            # still move the output
+            change = ticks - self._ticks
+            budget = self._slew_left + self._slew * elapsed
+            step = budget // 1000
+            if change > step:
+                ticks = self._ticks + step
+                self._slew_left = budget - step * 1000
+            elif change < -step:
+                ticks = self._ticks - step
+                self._slew_left = budget - step * 1000
+            else:
+                self._slew_left = 0
+        return ticks
+    
+    def set_compare(self, ticks):
+        """!
+        This method sets the PWM compare value directly in timer ticks, which
+        is faster than @c set_duty_cycle() as no scaling is needed. The output
+        shaping isn't applied. A channel is only written if its value changes.
+        @param ticks A signed integer holding the number of timer ticks in each
+               period for which the motor is driven; its sign gives the 
+               direction and its size is limited to the timer's period
+        """
+        if ticks >= 0:
+            if ticks > self._period:
+                ticks = self._period
+            ch1_ticks = ticks #PWM signal to IN1A
+            ch2_ticks = 0 #IN2A low
+        else:
+            if ticks < -self._period:
+                ticks = -self._period
+            ch1_ticks = 0 #IN1A low
+            ch2_ticks = -ticks #PWM signal to IN2A
+        self._ticks = ticks
+        
+        if ch1_ticks != self._ch1_ticks:
+            self.ch1.pulse_width(ch1_ticks)
+            self._ch1_ticks = ch1_ticks
+        if ch2_ticks != self._ch2_ticks:
+            self.ch2.pulse_width(ch2_ticks)
+            self._ch2_ticks = ch2_ticks
+    
+    def period(self):
+        """!
+        Returns the number of timer ticks in a PWM period, which is the
+        largest magnitude accepted by @c set_compare().
+        """
+        return self._period
      
     def enable(self):
+        # Slew from zero starting now, not from the last command
+        self._last_ms = utime.ticks_ms()
+        self._slew_left = 0
         self.en_pin.high()
     
     def disable(self):
-        self.set_duty_cyle(0)
+        self.set_compare(0) # stop at once, without slewing
         self.en_pin.low() #disable motor driver
         
     
@@ -0,0 +1,127 @@
+"""! @file pid_controller.py
+   This file implements a closed loop proportional, integral, derivative
+   controller class. It can be used in place of the proportional controller
+   in @c clp_controller.py to control a motor in the ME 405 lab.
+"""
+import utime
+from clp_controller import CLPController
+
+class PIDController(CLPController):
+    """!
+    closed loop PID controller class
+
+    The controller measures the time between runs, so the integral and
+    derivative terms stay correct when the task running it is late or is
+    given a longer period. The integral is clamped and is not increased
+    while the output is saturated, so it doesn't wind up during large steps.
+    The derivative is taken of the measured output rather than the error, so
+    a step in the setpoint doesn't kick the output, and it is passed through
+    a first order low pass filter to keep encoder quantization from making
+    it noisy.
+    """
+    def __init__ (self, Kp = 1, Ki = 0, Kd = 0, setpoint = 0, tau_d = 0.01,
+                  out_limit = 99, log_size = 0):
+        """!
+        Initialize the PID controller with its gains and setpoint.
+        @param Kp Proportional gain value (default value is 1)
+        @param Ki Integral gain value, per second (default value is 0)
+        @param Kd Derivative gain value, in seconds (default value is 0)
+        @param setpoint Setpoint for the controller (default value is 0)
+        @param tau_d Time constant of the derivative filter in seconds
+               (default value is 0.01)
+        @param out_limit The largest magnitude of the output; the default of
+               99 matches the range of @c MotorDriver.set_duty_cycle()
+        @param log_size How many samples to keep for @c print_response()
+               (default value is 0, no log)
+        """
+        super().__init__(Kp, setpoint, log_size)
+        self.Ki = Ki
+        self.Kd = Kd
+        self.tau_d = tau_d
+        self.out_limit = out_limit
+        self.reset()
+        
+    def __repr__(self):
+        return (f'PIDController(Kp={self.Kp}, Ki={self.Ki}, Kd={self.Kd}, '
+                f'setpoint={self.setpoint})')
+    
+    def __str__(self):
+        return (f'Closed-loop PID controller:\n\tKp={self.Kp}, Ki={self.Ki}, '
+                f'Kd={self.Kd} and\n\tsetpoint={self.setpoint}')
+
+    def reset (self):
+        """!
+        Clear the integral and derivative terms and forget the time of the
+        last run, as when a motor is first enabled.
+        """
+        self._integral = 0.0
+        self._deriv = 0.0
+        self._last_output = 0
+        self._last_us = None
+
+    def run (self, setpoint, meas_output, time = None):
+        """!
+        Run the PID controller.
+
+        The first run after the controller is made or reset has no previous
+        sample, so only its proportional term is used.
+        @param  setpoint The setpoint for the controller
+        @param  meas_output The measured output value
+        @param  time The time of the measurement in milliseconds, used only
+                when logging
+        @return The control output, limited to +/- @c out_limit
+        """
+        self.latest_output = meas_output
+        if self._log_size:
+            self._log(meas_output, time)
+
+        now = utime.ticks_us()
+        error = setpoint - meas_output
+        output = self.Kp * error
+
+        if self._last_us is not None:
+            dt = utime.ticks_diff(now, self._last_us) / 1000000
+            if dt > 0:
+                # Filtered derivative of the measurement, not of the error
+                rate = (self._last_output - meas_output) / dt
+                self._deriv += (rate - self._deriv) * dt / (self.tau_d + dt)
+                output += self.Kd * self._deriv
+
+                # Only integrate if doing so doesn't push a saturated output
+                # further past its limit
+                step = self.Ki * error * dt
+                total = output + self._integral + step
+                if -self.out_limit < total < self.out_limit \
+                        or (total > 0) != (step > 0):
+                    self._integral += step
+                    if self._integral > self.out_limit:
+                        self._integral = self.out_limit
+                    elif self._integral < -self.out_limit:
+                        self._integral = -self.out_limit
+            output += self._integral
+
+        self._last_output = meas_output
+        self._last_us = now
+
+        if output > self.out_limit:
+            return self.out_limit
+        if output < -self.out_limit:
+            return -self.out_limit
+        return output
+
+    def set_Ki(self, new_Ki):
+        """!
+        Set a new value for Ki.
+        @param new_Ki The new value for the integral gain, per second
+        """
+        self.Ki = new_Ki
+
+    def set_Kd(self, new_Kd):
+        """!
+        Set a new value for Kd.
+        @param new_Kd The new value for the derivative gain, in seconds
+        """
+        self.Kd = new_Kd
+
+if __name__ == "__main__":
+    pass
@@ -23,8 +23,10 @@ SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
 """
 
 import array
+import errno
 import gc
 import pyb
+import utime
 import micropython
 
 
@@ -71,10 +73,58 @@ class BaseShare:
         self._type_code = type_code
         self._thread_protect = thread_protect
 
+        # Subscribing tasks, and their methods which are called to wake them
+        # when data is put in
+        self._subscribers = []
+        self._wakers = []
+
         # Add this queue to the global share and queue list
         share_list.append (self)
 
 
+    def subscribe (self, task, coalesce = True):
+        """!
+        Have a task woken up each time data is put into this queue or share.
+
+        A task with no period which subscribes to a share runs only when new
+        data has been put in, instead of checking the share every period:
+        @code
+        writer = cotask.Task (writer_fun, name="Writer", priority=1,
+                              shares=(position,))
+        position.subscribe (writer)
+        @endcode
+        If the data is put in several times before the task gets to run, the
+        wakeups are normally coalesced so that the task runs only once; if
+        @c coalesce is @c False, the task runs once for each time data was
+        put in. Counting wakeups from an ISR isn't protected from the task
+        itself, so coalesced wakeups should be used for data put in by ISRs.
+        @param task The task to be woken up
+        @param coalesce @c True to run the task once for any number of puts
+               since it last ran, @c False to run it once for every put
+        """
+        self._subscribers.append (task)
+        self._wakers.append (task.go if coalesce else task.post)
+
+
+    def unsubscribe (self, task):
+        """!
+        Stop waking a task when data is put into this queue or share.
+        @param task A task which was given to @c subscribe()
+        """
+        while task in self._subscribers:
+            idx = self._subscribers.index (task)
+            del self._subscribers[idx]
+            del self._wakers[idx]
+
+
+    def _notify (self):
+        """!
+        Wake up the tasks which subscribe to this queue or share.
+        """
+        for waker in self._wakers:
+            waker ()
+
+
 # ============================================================================
 
 class Queue (BaseShare):
@@ -153,6 +203,13 @@ class Queue (BaseShare):
             self._buffer = None
             raise
 
+        # A view of the buffer through which blocks of data are copied
+        self._view = memoryview (self._buffer)
+
+        # Tasks which are woken when data or room becomes available
+        self._consumer = None
+        self._producer = None
+
         # Initialize pointers to be used for reading and writing data
         self.clear ()
 
@@ -162,7 +219,7 @@ class Queue (BaseShare):
 
 
     @micropython.native
-    def put (self, item, in_ISR = False):
+    def put (self, item, in_ISR = False, timeout = None):
         """!
         Put an item into the queue.
 
@@ -180,8 +237,14 @@ class Queue (BaseShare):
         |               my_queue.put (create_something_to_put ())
         |           yield 0
         @endcode
+        In a cooperatively scheduled task, @c try_put() or 
+        @c wait_notfull() should be used instead of waiting here, since no
+        other task can run to make room while this one waits.
         @param item The item to be placed into the queue
         @param in_ISR Set this to @c True if calling from within an ISR
+        @param timeout The longest time in milliseconds to wait for room,
+               or @c None to wait as long as it takes. If the time runs out,
+               @c OSError with @c errno.ETIMEDOUT is raised
         """
         # If we're in an ISR and the queue is full and we're not allowed to
         # overwrite data, we have to give up and exit
@@ -191,8 +254,7 @@ class Queue (BaseShare):
 
             # Wait (if needed) until there's room in the buffer for the data
             if not self._overwrite:
-                while self.full ():
-                    pass
+                self._wait_while (True, timeout)
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
@@ -213,9 +275,13 @@ class Queue (BaseShare):
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (_irq_state)
 
+        # Wake the tasks which subscribe to new data, including the consumer
+        if self._wakers:
+            self._notify ()
+
 
     @micropython.native
-    def get (self, in_ISR = False):
+    def get (self, in_ISR = False, timeout = None):
         """!
         Read an item from the queue.
 
@@ -233,11 +299,15 @@ class Queue (BaseShare):
         |           # More loop stuff
         |           yield 0
         @endcode
+        @c try_get() and @c wait_nonempty() make this easier.
         @param in_ISR Set this to @c True if calling from within an ISR
+        @param timeout The longest time in milliseconds to wait for data,
+               or @c None to wait as long as it takes. If the time runs out,
+               @c OSError with @c errno.ETIMEDOUT is raised
         """
         # Wait until there's something in the queue to be returned
-        while self.empty ():
-            pass
+        if self.empty ():
+            self._wait_while (False, timeout)
 
         # Prevent data corruption by blocking interrupts during data transfer
         if self._thread_protect and not in_ISR:
@@ -258,9 +328,266 @@ class Queue (BaseShare):
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (irq_state)
 
+        # Wake the producer, since there's room, and the consumer again if
+        # there's more data for it
+        if self._producer != None:
+            self._producer.go ()
+        if self._consumer != None and self._num_items > 0:
+            self._consumer.go ()
+
         return (to_return)
 
 
+    def put_many (self, buffer):
+        """!
+        Put a block of items into the queue.
+
+        The items are copied from an array or memoryview whose type code is
+        the same as the queue's, using at most two slice copies. This method
+        doesn't wait for room: if the queue can't hold all the items, as many
+        as fit are put in, unless the queue overwrites old data, in which
+        case the oldest items are discarded to make room. Interrupts are
+        disabled only once for the whole block. The slices used for copying
+        are allocated on the heap, so this method may only be called from a
+        task, never from an ISR; an ISR should use @c put().
+        @code
+        samples = array.array ('L', range (32))
+        # ... fill samples ...
+        num_put = my_queue.put_many (samples)
+        @endcode
+        @param buffer An array or memoryview holding the items to be put in
+        @return The number of items which were put into the queue
+        """
+        source = memoryview (buffer)
+        count = len (source)
+        size = self._size
+
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+
+        free = size - self._num_items
+        if count > free:
+            if self._overwrite:
+                # Only the newest items which fit in the whole queue are kept,
+                # and the read index skips past the items overwritten
+                if count > size:
+                    source = source[count - size:]
+                    count = size
+                dropped = count - free
+                self._rd_idx += dropped
+                if self._rd_idx >= size:
+                    self._rd_idx -= size
+                self._num_items -= dropped
+            else:
+                count = free
+
+        # Copy up to the end of the buffer, then wrap around to the start
+        wr_idx = self._wr_idx
+        first = size - wr_idx
+        if first > count:
+            first = count
+        self._view[wr_idx:wr_idx + first] = source[:first]
+        if count > first:
+            self._view[:count - first] = source[first:count]
+
+        wr_idx += count
+        if wr_idx >= size:
+            wr_idx -= size
+        self._wr_idx = wr_idx
+        self._num_items += count
+        if self._num_items > self._max_full:
+            self._max_full = self._num_items
+
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+
+        # Wake the tasks which subscribe to new data, including the consumer
+        if count > 0:
+            if self._wakers:
+                self._notify ()
+
+        return count
+
+
+    def get_into (self, buffer, max_items = None):
+        """!
+        Read a block of items from the queue into a buffer.
+
+        Items are copied into an array or memoryview whose type code is the
+        same as the queue's, using at most two slice copies. This method
+        doesn't wait for data; it reads as many items as are in the queue,
+        up to the size of the buffer or @c max_items. Interrupts are disabled
+        only once for the whole block. Like @c put_many(), this method
+        allocates slices, so it may only be called from a task.
+        @code
+        items = array.array ('L', range (16))
+        while True:
+            num = my_queue.get_into (items)
+            for idx in range (num):
+                do_something_with (items[idx])
+            yield 0
+        @endcode
+        @param buffer An array or memoryview into which items are copied
+        @param max_items The largest number of items to read, or @c None to
+               read as many as will fit in the buffer
+        @return The number of items which were read
+        """
+        dest = memoryview (buffer)
+        count = len (dest)
+        if max_items != None and max_items < count:
+            count = max_items
+        size = self._size
+
+        if self._thread_protect:
+            irq_state = pyb.disable_irq ()
+
+        if count > self._num_items:
+            count = self._num_items
+
+        # Copy up to the end of the buffer, then wrap around to the start
+        rd_idx = self._rd_idx
+        first = size - rd_idx
+        if first > count:
+            first = count
+        dest[:first] = self._view[rd_idx:rd_idx + first]
+        if count > first:
+            dest[first:count] = self._view[:count - first]
+
+        rd_idx += count
+        if rd_idx >= size:
+            rd_idx -= size
+        self._rd_idx = rd_idx
+        self._num_items -= count
+
+        if self._thread_protect:
+            pyb.enable_irq (irq_state)
+
+        # Wake the producer, since there's room, and the consumer again if
+        # there's more data for it
+        if count > 0 and self._producer != None:
+            self._producer.go ()
+        if self._consumer != None and self._num_items > 0:
+            self._consumer.go ()
+
+        return count
+
+
+    def try_put (self, item, in_ISR = False):
+        """!
+        Put an item into the queue if there's room, without waiting.
+        @param item The item to be placed into the queue
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if the item was put into the queue, @c False if the
+                queue was full and doesn't overwrite old data
+        """
+        if not self._overwrite and self.full ():
+            return False
+        self.put (item, in_ISR)
+        return True
+
+
+    def try_get (self, default = None, in_ISR = False):
+        """!
+        Read an item from the queue if there is one, without waiting.
+        @code
+        item = my_queue.try_get ()
+        if item is not None:
+            do_something_with (item)
+        @endcode
+        @param default The value to return if the queue is empty
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The item read from the queue, or @c default if it was empty
+        """
+        if self.empty ():
+            return default
+        return self.get (in_ISR)
+
+
+    def set_consumer (self, task):
+        """!
+        Choose a task to be woken whenever there's data in the queue.
+
+        The consumer is a subscriber to the queue, as if @c subscribe() had
+        been called, so its @c go() method is called when data is put into
+        the queue; it is also woken again each time it takes data out if more
+        remains. A task which has no period then runs only when there's data
+        for it, rather than checking the queue every period.
+        @param task The consuming task, or @c None
+        """
+        if self._consumer != None:
+            self.unsubscribe (self._consumer)
+        self._consumer = task
+        if task != None:
+            self.subscribe (task)
+
+
+    def set_producer (self, task):
+        """!
+        Choose a task to be woken whenever data is taken out of the queue,
+        making room for more.
+        @param task The producing task, or @c None
+        """
+        self._producer = task
+
+
+    def wait_nonempty (self, state = 0):
+        """!
+        Wait in a cooperative task until the queue has data in it.
+
+        This generator yields until there is something in the queue, letting
+        other tasks run in the meantime. It's used in a task's generator with
+        @c yield @c from, after which @c get() won't wait:
+        @code
+        def consumer_fun (shares):
+            the_queue = shares[0]
+            while True:
+                yield from the_queue.wait_nonempty ()
+                do_something_with (the_queue.get ())
+                yield 0
+
+        consumer = cotask.Task (consumer_fun, name="Consumer", shares=(q0,))
+        q0.set_consumer (consumer)
+        @endcode
+        If the consumer has been chosen with @c set_consumer() and has no
+        period, it only runs when there's data in the queue; otherwise it
+        should have a period so that it checks the queue each time it runs.
+        @param state The state which the task yields while waiting
+        """
+        while self.empty ():
+            yield state
+
+
+    def wait_notfull (self, state = 0):
+        """!
+        Wait in a cooperative task until there's room in the queue.
+
+        This generator works as @c wait_nonempty() does; the task chosen
+        with @c set_producer() is woken when data is taken from the queue.
+        @param state The state which the task yields while waiting
+        """
+        while self.full ():
+            yield state
+
+
+    def _wait_while (self, full, timeout):
+        """!
+        Wait while the queue is full or empty, for a limited time.
+        @param full @c True to wait while the queue is full, @c False to
+               wait while it's empty
+        @param timeout The longest time in milliseconds to wait, or @c None
+               to wait as long as it takes
+        """
+        if timeout is None:
+            while (self.full () if full else self.empty ()):
+                pass
+            return
+
+        start = utime.ticks_ms ()
+        while (self.full () if full else self.empty ()):
+            if utime.ticks_diff (utime.ticks_ms (), start) >= timeout:
+                raise OSError (errno.ETIMEDOUT)
+
+
     @micropython.native
     def any (self):
         """!
@@ -330,6 +657,253 @@ class Queue (BaseShare):
                 type_code_strings[self._type_code], self._max_full, self._size))
 
 
+# ============================================================================
+
+class SPSCQueue (Queue):
+    """!
+    A queue for one producer and one consumer which needs no locking.
+
+    In an ordinary queue, both @c put() and @c get() change the count of
+    items in the queue, so interrupts must be disabled while either one runs
+    if the producer and consumer can interrupt each other. In this queue the
+    producer only changes the write index and the consumer only changes the
+    read index; the number of items is found from the two indices. Each
+    index is changed in one step after the data has been written or read, so
+    one side can safely be an interrupt service routine without interrupts
+    ever being disabled. One slot of the buffer is kept empty so that a full
+    queue can be told apart from an empty one.
+
+    Only one task or ISR may put data into the queue and only one may get
+    data from it. Old data can't be overwritten, since only the consumer may
+    move the read index.
+
+    @code
+    # An ISR puts encoder counts into this queue; a task takes them out
+    counts = task_share.SPSCQueue ('H', 64, name="Counts")
+    @endcode
+    """
+
+    def __init__ (self, type_code, size, name = None):
+        """!
+        Initialize a single producer, single consumer queue.
+
+        @param type_code The type of data items which the queue can hold, as
+               for @c Queue
+        @param size The maximum number of items which the queue can hold
+        @param name A short name for the queue, default @c QueueN where @c N
+               is a serial number for the queue
+        """
+        # One more slot than the queue can hold is needed to tell a full
+        # queue from an empty one
+        super ().__init__ (type_code, size + 1, thread_protect = False,
+                           overwrite = False, name = name)
+
+
+    @micropython.native
+    def put (self, item, in_ISR = False, timeout = None):
+        """!
+        Put an item into the queue.
+
+        If there isn't room for the item, wait until the consumer makes room
+        unless called from an ISR, in which case the item is discarded.
+        @param item The item to be placed into the queue
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @param timeout The longest time in milliseconds to wait for room,
+               or @c None to wait as long as it takes
+        """
+        wr_idx = self._wr_idx
+        next_idx = wr_idx + 1
+        if next_idx >= self._size:
+            next_idx = 0
+
+        if next_idx == self._rd_idx:
+            if in_ISR:
+                return
+            self._wait_while (True, timeout)
+
+        # Write the data before moving the write index which publishes it
+        self._buffer[wr_idx] = item
+        self._wr_idx = next_idx
+
+        num_items = next_idx - self._rd_idx
+        if num_items < 0:
+            num_items += self._size
+        if num_items > self._max_full:
+            self._max_full = num_items
+
+        if self._wakers:
+            self._notify ()
+
+
+    @micropython.native
+    def get (self, in_ISR = False, timeout = None):
+        """!
+        Read an item from the queue.
+
+        If there isn't anything in there, wait until something becomes
+        available. Use @c try_get() to avoid waiting.
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @param timeout The longest time in milliseconds to wait for data,
+               or @c None to wait as long as it takes
+        """
+        rd_idx = self._rd_idx
+        if rd_idx == self._wr_idx:
+            self._wait_while (False, timeout)
+
+        # Read the data before moving the read index which frees its slot
+        to_return = self._buffer[rd_idx]
+        rd_idx += 1
+        if rd_idx >= self._size:
+            rd_idx = 0
+        self._rd_idx = rd_idx
+
+        if self._producer != None:
+            self._producer.go ()
+        if self._consumer != None and rd_idx != self._wr_idx:
+            self._consumer.go ()
+
+        return (to_return)
+
+
+    def put_many (self, buffer):
+        """!
+        Put a block of items into the queue without waiting.
+
+        As many of the items as fit are copied in with at most two slice
+        copies, then the write index is moved once to publish them all. The
+        slices are allocated on the heap, so this method may only be called
+        from a task; an ISR should use @c put().
+        @param buffer An array or memoryview holding the items to be put in
+        @return The number of items which were put into the queue
+        """
+        source = memoryview (buffer)
+        count = len (source)
+        size = self._size
+        wr_idx = self._wr_idx
+
+        free = self._rd_idx - wr_idx - 1
+        if free < 0:
+            free += size
+        if count > free:
+            count = free
+
+        first = size - wr_idx
+        if first > count:
+            first = count
+        self._view[wr_idx:wr_idx + first] = source[:first]
+        if count > first:
+            self._view[:count - first] = source[first:count]
+
+        wr_idx += count
+        if wr_idx >= size:
+            wr_idx -= size
+        self._wr_idx = wr_idx
+
+        num_items = size - 1 - free + count
+        if num_items > self._max_full:
+            self._max_full = num_items
+
+        if count > 0:
+            if self._wakers:
+                self._notify ()
+
+        return count
+
+
+    def get_into (self, buffer, max_items = None):
+        """!
+        Read a block of items from the queue into a buffer without waiting.
+
+        As many items as are available, up to the size of the buffer or
+        @c max_items, are copied out with at most two slice copies, then the
+        read index is moved once to free their slots. Like @c put_many(),
+        this method may only be called from a task.
+        @param buffer An array or memoryview into which items are copied
+        @param max_items The largest number of items to read, or @c None to
+               read as many as will fit in the buffer
+        @return The number of items which were read
+        """
+        dest = memoryview (buffer)
+        count = len (dest)
+        if max_items != None and max_items < count:
+            count = max_items
+        size = self._size
+        rd_idx = self._rd_idx
+
+        num_items = self._wr_idx - rd_idx
+        if num_items < 0:
+            num_items += size
+        if count > num_items:
+            count = num_items
+
+        first = size - rd_idx
+        if first > count:
+            first = count
+        dest[:first] = self._view[rd_idx:rd_idx + first]
+        if count > first:
+            dest[first:count] = self._view[:count - first]
+
+        rd_idx += count
+        if rd_idx >= size:
+            rd_idx -= size
+        self._rd_idx = rd_idx
+
+        if count > 0 and self._producer != None:
+            self._producer.go ()
+        if self._consumer != None and rd_idx != self._wr_idx:
+            self._consumer.go ()
+
+        return count
+
+
+    @micropython.native
+    def any (self):
+        """!
+        Check if there are any items in the queue.
+        @return @c True if items are in the queue, @c False if not
+        """
+        return (self._rd_idx != self._wr_idx)
+
+
+    @micropython.native
+    def empty (self):
+        """!
+        Check if the queue is empty.
+        @return @c True if queue is empty, @c False if it's not empty
+        """
+        return (self._rd_idx == self._wr_idx)
+
+
+    @micropython.native
+    def full (self):
+        """!
+        Check if the queue is full.
+        @return @c True if the queue is full
+        """
+        return (self.num_in () >= self._size - 1)
+
+
+    @micropython.native
+    def num_in (self):
+        """!
+        Check how many items are in the queue.
+        @return The number of items in the queue
+        """
+        num_items = self._wr_idx - self._rd_idx
+        if num_items < 0:
+            num_items += self._size
+        return (num_items)
+
+
+    def __repr__ (self):
+        """!
+        This method puts diagnostic information about the queue into a string.
+        """
+        return ('{:<12s} SPSCQueue<{:s}> Max Full {:d}/{:d}'.format (
+                self._name, type_code_strings[self._type_code],
+                self._max_full, self._size - 1))
+
+
 # ============================================================================
 
 class Share (BaseShare):
@@ -416,6 +990,10 @@ class Share (BaseShare):
         if self._thread_protect and not in_ISR:
             pyb.enable_irq (irq_state)
 
+        # Wake any tasks which subscribe to new data
+        if self._wakers:
+            self._notify ()
+
 
     @micropython.native
     def get (self, in_ISR = False):
@@ -450,3 +1028,323 @@ class Share (BaseShare):
                 type_code_strings[self._type_code]))
 
 
+
+
+# ============================================================================
+
+class StructShare (BaseShare):
+    """!
+    A group of data items which are shared between tasks as one unit.
+
+    Reading several ordinary shares one after another can give a set of
+    values which were written at different times, and each read may disable
+    interrupts. A struct share holds several fields of one type in a single
+    buffer along with a version number. The version is made odd while a
+    writer is changing the fields and even when it's done, so a reader can
+    copy all the fields and then check that the version didn't change while
+    it did so; if it did, the reader simply copies them again. Interrupts are
+    never disabled and no memory is allocated.
+
+    One writer at a time may change the fields. Writers which are tasks in
+    the same cooperative scheduler can't interrupt each other, so different
+    tasks may write different fields with @c put_field(). 
+
+    @code
+    import task_share
+
+    # A share holding the positions of both motors
+    positions = task_share.StructShare ('l', ('pos_m1', 'pos_m2'),
+                                        name="Positions")
+
+    # In one task, write a field
+    positions.put_field (0, encoder1.read ())
+
+    # In another task, read all the fields at once into an array
+    snapshot = array.array ('l', [0, 0])
+    positions.get_into (snapshot)
+    @endcode
+    """
+    ## A counter used to give serial numbers to shares for diagnostic use.
+    ser_num = 0
+
+
+    def __init__ (self, type_code, fields, name = None):
+        """!
+        Create a struct share with the given fields.
+
+        @param type_code The type of data held in every field, chosen from the
+               type codes listed for @c Share
+        @param fields A list or tuple of the names of the fields
+        @param name A short name for the share, default @c StructN where
+               @c N is a serial number for the share
+        """
+        super ().__init__ (type_code, False, name)
+
+        self._fields = tuple (fields)
+        self._num_fields = len (self._fields)
+        self._buffer = array.array (type_code, range (self._num_fields))
+        for idx in range (self._num_fields):
+            self._buffer[idx] = 0
+
+        # The version is odd while the fields are being written. It's kept
+        # in the range of a small integer; the mask keeps odd values odd
+        self._version = 0
+
+        self._name = str (name) if name != None \
+            else 'Struct' + str (StructShare.ser_num)
+        StructShare.ser_num += 1
+
+
+    def field (self, name):
+        """!
+        Find the index of a field from its name.
+        @param name The name of the field
+        @return The index of the field, for use with @c put_field() and
+                @c get()
+        """
+        return self._fields.index (name)
+
+
+    @micropython.native
+    def put (self, values, in_ISR = False):
+        """!
+        Write all the fields at once.
+        @param values A list, tuple or array holding a value for each field,
+               in the order in which the fields were named
+        @param in_ISR Set this to @c True if calling from within an ISR
+        """
+        self._version = (self._version + 1) & 0x3FFFFFFF
+        for idx in range (self._num_fields):
+            self._buffer[idx] = values[idx]
+        self._version = (self._version + 1) & 0x3FFFFFFF
+
+        if self._wakers:
+            self._notify ()
+
+
+    @micropython.native
+    def put_field (self, index, value, in_ISR = False):
+        """!
+        Write one field, leaving the others as they are.
+        @param index The index of the field, as found by @c field()
+        @param value The new value of the field
+        @param in_ISR Set this to @c True if calling from within an ISR
+        """
+        self._version = (self._version + 1) & 0x3FFFFFFF
+        self._buffer[index] = value
+        self._version = (self._version + 1) & 0x3FFFFFFF
+
+        if self._wakers:
+            self._notify ()
+
+
+    @micropython.native
+    def get_into (self, dest, in_ISR = False):
+        """!
+        Copy all the fields, as they were at one moment, into an array.
+
+        If a writer changes the fields during the copy, they are copied
+        again. An ISR can't wait for a task which it has interrupted to
+        finish writing, so when called from an ISR, this method gives up if
+        a write is in progress.
+        @param dest An array or list with room for all the fields
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return @c True if a consistent set of fields was copied, or 
+                @c False if an ISR found a write in progress
+        """
+        while True:
+            version = self._version
+            if version & 1:
+                if in_ISR:
+                    return False
+                continue
+            for idx in range (self._num_fields):
+                dest[idx] = self._buffer[idx]
+            if self._version == version:
+                return True
+
+
+    @micropython.native
+    def get (self, index, in_ISR = False):
+        """!
+        Read one field.
+        @param index The index of the field, as found by @c field()
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The value of the field
+        """
+        return self._buffer[index]
+
+
+    def version (self):
+        """!
+        Get the share's version number, which changes by two with each write.
+        A reader can compare versions to find out whether there's new data.
+        @return The version number, which is odd while a write is under way
+        """
+        return self._version
+
+
+    def __repr__ (self):
+        """!
+        Puts diagnostic information about the share into a string.
+        """
+        return ("{:<12s} Struct<{:s}> {:s}".format (self._name,
+                type_code_strings[self._type_code], ', '.join (self._fields)))
+
+
+# ============================================================================
+
+class FrameShare (BaseShare):
+    """!
+    A pair of buffers through which blocks of data are passed between tasks.
+
+    A frame share is used to stream data such as samples taken at a high
+    rate. The producer fills one frame, item by item, while the consumer
+    works on the other one; when the producer's frame is full it publishes
+    it and the two frames are swapped. No data is copied, so storing a sample
+    costs only one indexed store into an array. 
+
+    The consumer must release a frame when it's done with it. If the
+    producer publishes another frame before the previous one has been
+    released, the new frame is dropped (and counted) and the producer fills
+    the same frame again, so a frame is never changed while the consumer is
+    using it. Neither side needs to disable interrupts, so the producer may
+    be an ISR.
+
+    @code
+    import task_share
+
+    # Frames of 50 (time, position 1, position 2) samples
+    frames = task_share.FrameShare ('l', 150, name="Samples")
+
+    # In the producing task, fill the frame and publish it when it's full
+    frame = frames.frame ()
+    frame[idx] = time
+    ...
+    if idx >= 150:
+        frame = frames.publish ()
+        idx = 0
+
+    # In the consuming task, ship each new frame
+    data = frames.get ()
+    if data is not None:
+        uart.write (data)
+        frames.release ()
+    @endcode
+    """
+    ## A counter used to give serial numbers to shares for diagnostic use.
+    ser_num = 0
+
+
+    def __init__ (self, type_code, frame_size, name = None):
+        """!
+        Create a frame share, allocating both of its frames.
+
+        @param type_code The type of data items in the frames, chosen from the
+               type codes listed for @c Share
+        @param frame_size The number of items which each frame holds
+        @param name A short name for the share, default @c FrameN where @c N
+               is a serial number for the share
+        """
+        super ().__init__ (type_code, False, name)
+
+        self._size = frame_size
+        self._frames = (array.array (type_code, range (frame_size)),
+                        array.array (type_code, range (frame_size)))
+        self._views = (memoryview (self._frames[0]),
+                       memoryview (self._frames[1]))
+
+        # The index of the frame being filled by the producer; the other one
+        # belongs to the consumer while a published frame is ready
+        self._back = 0
+        self._ready = False
+        self._length = 0
+
+        self._published = 0
+        self._dropped = 0
+
+        self._name = str (name) if name != None \
+            else 'Frame' + str (FrameShare.ser_num)
+        FrameShare.ser_num += 1
+
+        gc.collect ()
+
+
+    def frame (self):
+        """!
+        Get the frame which the producer is to fill.
+        @return The array holding the frame being filled
+        """
+        return self._frames[self._back]
+
+
+    def publish (self, length = None, in_ISR = False):
+        """!
+        Hand the frame which has been filled over to the consumer.
+
+        If the consumer hasn't released the previous frame, this frame is
+        dropped and must be filled again.
+        @param length The number of items which were put into the frame, or
+               @c None if the whole frame was filled
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return The frame which the producer is to fill next
+        """
+        if self._ready:
+            self._dropped += 1
+            return self._frames[self._back]
+
+        self._length = self._size if length is None else length
+        self._back ^= 1
+        self._published += 1
+        self._ready = True
+
+        if self._wakers:
+            self._notify ()
+
+        return self._frames[self._back]
+
+
+    def any (self):
+        """!
+        Check if a published frame is waiting for the consumer.
+        @return @c True if there's a frame which hasn't been released
+        """
+        return self._ready
+
+
+    def get (self, in_ISR = False):
+        """!
+        Get the most recently published frame.
+
+        The frame stays the consumer's until @c release() is called. If the
+        whole frame was filled, the view returned is made when the share is
+        created, so no memory is allocated.
+        @param in_ISR Set this to @c True if calling from within an ISR
+        @return A memoryview of the items in the frame, or @c None if no new
+                frame has been published
+        """
+        if not self._ready:
+            return None
+        view = self._views[self._back ^ 1]
+        if self._length == self._size:
+            return view
+        return view[:self._length]
+
+
+    def release (self):
+        """!
+        Give the frame obtained from @c get() back so that it can be refilled.
+        """
+        self._ready = False
+
+
+    def __repr__ (self):
+        """!
+        Puts diagnostic information about the share into a string.
+
+        This shows the frame size and how many frames have been published
+        and dropped.
+        """
+        return ("{:<12s} Frame<{:s}> Size {:d} Published {:d} Dropped {:d}"
+                .format (self._name, type_code_strings[self._type_code],
+                         self._size, self._published, self._dropped))
@@ -0,0 +1,171 @@
+"""! @file trajectory.py
+   This file contains a motion profile generator which gives the position
+   controllers a smooth path to follow instead of a step. A trapezoidal or
+   S-curve profile from one position to another is worked out once, when it
+   is made, as a table of setpoints at every tick of the task which streams
+   it; while the motor moves, finding each setpoint costs only a subtraction,
+   a division and an index.
+"""
+import math
+import utime
+from array import array
+
+class Profile:
+    """!
+    A motion profile: the setpoints of a move from one position to another,
+    one for each period of the task which follows it.
+
+    The profile starts when @c start() is called, and @c setpoint() gives
+    the point for the time at which it is called, so a late task still
+    gets the right setpoint instead of falling behind. After the end of the
+    move, the final position is held.
+
+    Example:
+      @code
+          profile = trajectory.Profile(0, 20000, v_max=30000, a_max=100000,
+                                       period=20, shape='s_curve')
+          profile.start()
+          ...
+          share_m1_setpoint.put(profile.setpoint())
+      @endcode
+    """
+
+    def __init__(self, start, end, v_max, a_max, period, shape='trapezoid'):
+        """!
+        Work out a profile and save its setpoints.
+        @param start The position at which the move starts, in encoder ticks
+        @param end The position at which the move ends, in encoder ticks
+        @param v_max The highest speed allowed, in ticks per second
+        @param a_max The highest acceleration allowed, in ticks per second
+               squared
+        @param period The time between setpoints in milliseconds, which
+               should be the period of the task which uses them
+        @param shape @c 'trapezoid' for constant acceleration while speeding
+               up and slowing down, or @c 's_curve' for acceleration which
+               rises and falls smoothly, which is gentler on the motor but
+               takes a little longer
+        """
+        if shape not in ('trapezoid', 's_curve'):
+            raise ValueError(f"Unknown profile shape '{shape}'")
+        if v_max <= 0 or a_max <= 0 or period <= 0:
+            raise ValueError("Speed, acceleration and period must be > 0")
+
+        distance = abs(end - start)
+        direction = 1 if end >= start else -1
+        s_curve = shape == 's_curve'
+
+        # An S-curve's acceleration peaks at pi/2 times its average
+        avg_accel = a_max * 2 / math.pi if s_curve else a_max
+
+        # If the move is too short to reach full speed, the profile is a
+        # triangle (or a hump, for an S-curve) instead of a trapezoid
+        v_peak = min(v_max, math.sqrt(distance * avg_accel))
+        t_acc = v_peak / avg_accel if v_peak else 0.0
+        d_acc = v_peak * t_acc / 2
+        t_cruise = (distance - 2 * d_acc) / v_peak if v_peak else 0.0
+        t_total = 2 * t_acc + t_cruise
+
+        ## The time between setpoints in milliseconds
+        self.period = period
+        ## The setpoints in encoder ticks, one for each period of the move
+        self.points = array('l', [end] * (int(t_total * 1000 / period) + 2))
+
+        for idx in range(len(self.points) - 1):
+            t = idx * period / 1000
+            if t < t_acc:
+                moved = self._ramp(t, t_acc, v_peak, s_curve)
+            elif t < t_acc + t_cruise:
+                moved = d_acc + v_peak * (t - t_acc)
+            elif t < t_total:
+                moved = distance - self._ramp(t_total - t, t_acc, v_peak,
+                                              s_curve)
+            else:
+                break
+            self.points[idx] = start + direction * int(moved + 0.5)
+
+        self._last = len(self.points) - 1
+        self._start_ms = utime.ticks_ms()
+
+    @staticmethod
+    def _ramp(t, t_acc, v_peak, s_curve):
+        """!
+        Find the distance moved while speeding up from rest.
+        @param t The time since the start of the move in seconds
+        @param t_acc The time taken to reach the peak speed
+        @param v_peak The peak speed
+        @param s_curve @c True for an S-curve, @c False for a trapezoid
+        @return The distance moved
+        """
+        if s_curve:
+            # Speed rises as half a cosine wave
+            w = math.pi / t_acc
+            return v_peak / 2 * (t - math.sin(w * t) / w)
+        return v_peak / t_acc * t * t / 2
+
+    def __len__(self):
+        return len(self.points)
+
+    def __repr__(self):
+        return (f"Profile({self.points[0]} to {self.points[self._last]}, "
+                f"{len(self.points)} points every {self.period} ms)")
+
+    def start(self, now=None):
+        """!
+        Start the move.
+        @param now The starting time from @c utime.ticks_ms(), or @c None to
+               start now
+        """
+        self._start_ms = utime.ticks_ms() if now is None else now
+
+    def setpoint(self, now=None):
+        """!
+        Get the setpoint for the present time.
+        @param now The time from @c utime.ticks_ms(), or @c None to read the
+               clock
+        @return The setpoint in encoder ticks
+        """
+        if now is None:
+            now = utime.ticks_ms()
+        idx = utime.ticks_diff(now, self._start_ms) // self.period
+        if idx > self._last:
+            idx = self._last
+        elif idx < 0:
+            idx = 0
+        return self.points[idx]
+
+    def done(self, now=None):
+        """!
+        Check if the move has finished.
+        @param now The time from @c utime.ticks_ms(), or @c None to read the
+               clock
+        @return @c True if the final position has been reached
+        """
+        if now is None:
+            now = utime.ticks_ms()
+        return utime.ticks_diff(now, self._start_ms) >= self._last * self.period
+
+
+def task_trajectory(shares):
+    """!
+    Task which streams the setpoints of motion profiles into shares, so that
+    the motor tasks which read the shares follow the profiles. All of the
+    profiles start when the task first runs. The task should have the same
+    period as the profiles and a higher priority than the motor tasks.
+    @param shares A tuple of (profile, setpoint share) pairs
+    """
+    now = utime.ticks_ms()
+    for profile, setpoint in shares:
+        profile.start(now)
+
+    while True:
+        now = utime.ticks_ms()
+        for profile, setpoint in shares:
+            setpoint.put(profile.setpoint(now))
+        yield 0
+
+
+if __name__ == "__main__":
+    for shape in ('trapezoid', 's_curve'):
+        profile = Profile(0, 20000, 30000, 100000, 20, shape)
+        print(profile)
+        print(list(profile.points))